@@ -4,29 +4,583 @@
 # Requires: discord.py==2.3.2
 # Configure DISCORD_BOT_TOKEN in environment variables before running.
 
-import os, json, asyncio, datetime, threading, http.server, socketserver
-from typing import Optional, Dict, Any, Union, List
+import io, os, re, sys, json, math, time, heapq, shlex, atexit, bisect, signal, logging, sqlite3, asyncio, argparse, datetime, functools, itertools, threading, subprocess, contextvars, unicodedata
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from typing import Optional, Dict, Any, Union, List, Iterable, Iterator, Set, Tuple, Callable, Awaitable
 
 import discord
+from aiohttp import web
 from discord.ext import commands
 from discord import app_commands
 
-# -------------------- Keep-alive (Render) --------------------
-def keep_alive():
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# -------------------- Paramètres --------------------
+def env_int(name: str, default: int) -> int:
+    """Lit un entier depuis les variables d'environnement"""
     try:
-        port = int(os.environ.get("PORT", 8080))
+        return int(os.environ.get(name, default))
     except Exception:
-        port = 8080
+        return default
 
-    class QuietHandler(http.server.SimpleHTTPRequestHandler):
-        def log_message(self, format, *args):
-            return
+def env_float(name: str, default: float) -> float:
+    """Lit un nombre décimal depuis les variables d'environnement"""
+    try:
+        return float(os.environ.get(name, default))
+    except Exception:
+        return default
+
+STATUS_SWEEP_WORKERS = env_int("STATUS_SWEEP_WORKERS", 8)
+MEMBER_EDIT_RATE = env_int("MEMBER_EDIT_RATE", 10)     # éditions de membres par fenêtre et par serveur
+MEMBER_EDIT_PER = env_float("MEMBER_EDIT_PER", 10.0)   # durée de la fenêtre (secondes)
+PRESENCE_COALESCE_WINDOW = env_float("PRESENCE_COALESCE_WINDOW", 2.0)  # secondes
+CONFIG_FLUSH_INTERVAL = env_float("CONFIG_FLUSH_INTERVAL", 2.0)        # secondes
+SLOW_HANDLER_THRESHOLD = env_float("SLOW_HANDLER_THRESHOLD", 1.0)      # secondes (0 = désactivé), modifiable via +trace
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+USER_CACHE_SIZE = env_int("USER_CACHE_SIZE", 5000)
+USER_CACHE_TTL = env_float("USER_CACHE_TTL", 600.0)                    # secondes
+USER_CACHE_NEGATIVE_TTL = env_float("USER_CACHE_NEGATIVE_TTL", 60.0)   # secondes (IDs inconnus)
+JOIN_BURST_THRESHOLD = env_int("JOIN_BURST_THRESHOLD", 10)   # arrivées sur la fenêtre au-delà desquelles on groupe
+JOIN_BURST_WINDOW = env_float("JOIN_BURST_WINDOW", 10.0)     # secondes
+JOIN_BATCH_INTERVAL = env_float("JOIN_BATCH_INTERVAL", 5.0)  # secondes entre deux messages groupés
+JOIN_BATCH_SIZE = env_int("JOIN_BATCH_SIZE", 25)             # membres max par message groupé
+ROLE_CREATE_RATE = env_int("ROLE_CREATE_RATE", 5)             # créations de rôles par fenêtre et par serveur
+ROLE_CREATE_PER = env_float("ROLE_CREATE_PER", 5.0)           # secondes
+ROLE_CREATE_WORKERS = env_int("ROLE_CREATE_WORKERS", 3)
+MASS_ACTION_MAX = env_int("MASS_ACTION_MAX", 1000)           # cibles max par commande groupée
+MASS_ACTION_WORKERS = env_int("MASS_ACTION_WORKERS", 4)      # kicks/timeouts simultanés
+BULK_BAN_CHUNK = 200                                          # limite de l'API bulk-ban
+CLEAR_MAX = env_int("CLEAR_MAX", 50000)                       # messages max supprimés par +clear
+CLEAR_SCAN_MAX = env_int("CLEAR_SCAN_MAX", 200000)            # messages max parcourus par +clear
+SHARD_COUNT = env_int("SHARD_COUNT", 0)                       # 0 = une seule connexion gateway (pas de sharding)
+SHARD_IDS = os.environ.get("SHARD_IDS", "")                   # shards gérés par ce processus, ex. "0-3,8" (vide = tous)
+CLUSTER_ID = env_int("CLUSTER_ID", 0)                         # numéro du processus dans le cluster (fixé par le lanceur)
+CLUSTER_IDENTIFY_DELAY = env_float("CLUSTER_IDENTIFY_DELAY", 5.0)  # secondes par shard entre deux démarrages de processus
+STARTUP_CHUNKING = os.environ.get("STARTUP_CHUNKING", "selective")  # "selective" : serveurs à rôles de statut seulement, "all" : tous
+CHUNK_WORKERS = env_int("CHUNK_WORKERS", 2)                   # serveurs chargés simultanément au démarrage
+SCHEDULER_HORIZON = env_float("SCHEDULER_HORIZON", 3600.0)    # secondes d'échéances gardées en mémoire
+SCHEDULER_BATCH = env_int("SCHEDULER_BATCH", 5000)            # actions chargées par lecture de la base
+SCHEDULER_WORKERS = env_int("SCHEDULER_WORKERS", 4)           # actions exécutées simultanément
+SCHEDULER_RETRY_DELAY = env_float("SCHEDULER_RETRY_DELAY", 60.0)  # secondes avant une nouvelle tentative (doublé à chaque échec)
+SCHEDULER_MAX_ATTEMPTS = env_int("SCHEDULER_MAX_ATTEMPTS", 5)
+TIMEOUT_MAX = 28 * 86400                                      # durée maximale d'un timeout Discord
+MUTED_ROLE_NAME = "Muted"                                     # rôle utilisé au-delà de TIMEOUT_MAX
+AUTOMOD_MAX_TRACKED = env_int("AUTOMOD_MAX_TRACKED", 50000)   # membres (et salons) suivis au plus par l'anti-spam
+AUTOMOD_ACTION_COOLDOWN = env_float("AUTOMOD_ACTION_COOLDOWN", 30.0)  # secondes entre deux sanctions/alertes pour la même cible
+RAID_MAX_ENTRIES = env_int("RAID_MAX_ENTRIES", 5000)         # empreintes de messages gardées par serveur
+RAID_BUCKET_SIZE = env_int("RAID_BUCKET_SIZE", 8)            # groupes récents comparés par bande LSH
+PROCESS_STARTED = time.monotonic()
+
+# -------------------- Traçage et profilage --------------------
+class Trace:
+    """Durées cumulées par type d'attente pendant un handler (REST, limiteurs, base...)"""
+    __slots__ = ("name", "started", "spans")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}
+
+    def add(self, label: str, duration: float):
+        span = self.spans.get(label)
+        if span is None:
+            self.spans[label] = [1, duration]
+        else:
+            span[0] += 1
+            span[1] += duration
+
+    def finish(self):
+        """Journalise la trace si le handler a dépassé le seuil"""
+        elapsed = time.perf_counter() - self.started
+        if SLOW_HANDLER_THRESHOLD > 0 and elapsed >= SLOW_HANDLER_THRESHOLD:
+            print(self.format(elapsed))
+
+    def format(self, elapsed: float) -> str:
+        spans = sorted(self.spans.items(), key=lambda item: -item[1][1])
+        parts = [f"{label} ×{count:.0f} {total:.2f}s" for label, (count, total) in spans[:8]]
+        # Les spans concurrents (gather) peuvent dépasser la durée totale
+        other = max(0.0, elapsed - sum(total for _, total in self.spans.values()))
+        parts.append(f"autre (CPU/boucle) {other:.2f}s")
+        return f"[SLOW] {self.name} {elapsed:.2f}s : " + ", ".join(parts)
+
+current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+class trace_span:
+    """Mesure une portion du handler tracé en cours (sans effet hors d'une trace)"""
+    __slots__ = ("label", "trace", "start")
+
+    def __init__(self, label: str):
+        self.label = label
+
+    def __enter__(self):
+        self.trace = current_trace.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.trace is not None:
+            self.trace.add(self.label, time.perf_counter() - self.start)
+
+class SamplingProfiler:
+    """Profileur par échantillonnage : relève la pile du thread de la boucle, sortie au format flamegraph (folded)"""
+    MAX_STACKS = 50000
+
+    def __init__(self):
+        self.samples: Dict[str, int] = {}
+        self.hz = 0
+        self.started_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, hz: int, thread_ident: int):
+        self.samples = {}
+        self.hz = hz
+        self.started_at = time.monotonic()
+        self._target = thread_ident
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        interval = 1.0 / self.hz
+        while not self._stop.wait(interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            key = ";".join(reversed(stack))
+            if key not in self.samples and len(self.samples) >= self.MAX_STACKS:
+                key = "[piles tronquées]"
+            self.samples[key] = self.samples.get(key, 0) + 1
+
+    def stop(self) -> Tuple[int, str]:
+        """Arrête l'échantillonnage et écrit les piles ; retourne (échantillons, chemin)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"profile-{datetime.datetime.now():%Y%m%d-%H%M%S}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+        return sum(self.samples.values()), path
+
+profiler = SamplingProfiler()
+
+# -------------------- Métriques --------------------
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Compteur monotone avec étiquettes"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for label_values, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value:g}"
+
+class Histogram:
+    """Histogramme de latences (seaux cumulés au format Prometheus)"""
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # étiquettes -> [compte par seau..., somme, total]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        state = self.values.get(label_values)
+        if state is None:
+            state = self.values[label_values] = [0.0] * (len(self.buckets) + 2)
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def samples(self) -> Iterator[str]:
+        for label_values, state in self.values.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{bound:g}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {cumulative:g}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labels, label_values, le)} {state[-1]:g}"
+            yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {state[-2]:g}"
+            yield f"{self.name}_count{_format_labels(self.labels, label_values)} {state[-1]:g}"
+
+class CallbackMetric:
+    """Métrique lue au moment de l'export (jauges d'état, compteurs existants)"""
+    def __init__(self, name: str, help_text: str, kind: str, labels: Tuple[str, ...],
+                 callback: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labels = labels
+        self.callback = callback
+
+    def samples(self) -> Iterator[str]:
+        for label_values, value in self.callback().items():
+            if value is None or not math.isfinite(value):
+                continue
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value:g}"
+
+class MetricsRegistry:
+    """Registre des métriques exposées au format texte Prometheus sur /metrics"""
+    def __init__(self):
+        self.metrics: List[Any] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                print(f"[METRICS] Erreur export {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+COMMANDS_TOTAL = metrics.register(Counter("hoshikuzu_commands_total", "Commandes exécutées", ("command", "outcome")))
+COMMAND_DURATION = metrics.register(Histogram("hoshikuzu_command_duration_seconds", "Durée des commandes", ("command",)))
+EVENTS_TOTAL = metrics.register(Counter("hoshikuzu_events_total", "Événements traités", ("event", "outcome")))
+EVENT_DURATION = metrics.register(Histogram("hoshikuzu_event_duration_seconds", "Durée des handlers d'événements", ("event",)))
+REST_REQUESTS_TOTAL = metrics.register(Counter("hoshikuzu_rest_requests_total", "Appels REST sortants", ("method", "route", "outcome")))
+REST_DURATION = metrics.register(Histogram("hoshikuzu_rest_request_duration_seconds", "Durée des appels REST (attente de rate limit incluse)", ("method", "route")))
+REST_RATELIMITED_TOTAL = metrics.register(Counter("hoshikuzu_rest_ratelimited_total", "Réponses 429 reçues", ("method", "route", "scope")))
+
+def instrumented_event(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """Mesure nombre, erreurs et durée d'un handler d'événement et le trace (à placer sous @bot.event)"""
+    event_name = func.__name__
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "ok"
+        trace = Trace(f"événement {event_name}")
+        token = current_trace.set(trace)
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            current_trace.reset(token)
+            trace.finish()
+            EVENTS_TOTAL.inc(event_name, outcome)
+            EVENT_DURATION.observe(time.perf_counter() - start, event_name)
+    
+    return wrapper
+
+def instrument_http(http) -> None:
+    """Enveloppe HTTPClient.request pour compter les appels REST par route"""
+    original_request = http.request
+    
+    async def request(route, **kwargs):
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            with trace_span(f"REST {route.method} {route.path}"):
+                return await original_request(route, **kwargs)
+        except discord.HTTPException as e:
+            outcome = str(e.status)
+            raise
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            REST_REQUESTS_TOTAL.inc(route.method, route.path, outcome)
+            REST_DURATION.observe(time.perf_counter() - start, route.method, route.path)
+    
+    http.request = request
+
+class RateLimitLogHandler(logging.Handler):
+    """Compte les 429 à partir des avertissements du logger discord.http (pas d'événement dédié dans discord.py)"""
+    SNOWFLAKE = re.compile(r"/\d{15,21}")
+
+    def emit(self, record: logging.LogRecord):
+        message = str(record.msg)
+        if message.startswith("We are being rate limited") and len(record.args or ()) >= 2:
+            method, url = record.args[0], str(record.args[1])
+            path = url.split("/api/v10", 1)[-1].split("?", 1)[0]
+            REST_RATELIMITED_TOTAL.inc(str(method), self.SNOWFLAKE.sub("/{id}", path), "route")
+        elif message.startswith("Global rate limit"):
+            REST_RATELIMITED_TOTAL.inc("*", "*", "global")
+
+logging.getLogger("discord.http").addHandler(RateLimitLogHandler(logging.WARNING))
+
+# Compteurs déjà tenus par les composants du bot, lus à l'export
+metrics.register(CallbackMetric(
+    "hoshikuzu_gateway_latency_seconds", "Latence du heartbeat gateway", "gauge", (),
+    lambda: {(): bot.latency}
+))
+metrics.register(CallbackMetric(
+    "hoshikuzu_shard_latency_seconds", "Latence du heartbeat par shard", "gauge", ("shard",),
+    lambda: {(str(shard_id),): latency for shard_id, latency in getattr(bot, "latencies", [])}
+))
+metrics.register(CallbackMetric(
+    "hoshikuzu_queue_depth", "Profondeur des files internes", "gauge", ("queue",),
+    lambda: {(name,): depth for name, depth in queue_depths().items()}
+))
+metrics.register(CallbackMetric(
+    "hoshikuzu_presence_updates_total", "Mises à jour de présence par issue", "counter", ("result",),
+    lambda: {(result,): count for result, count in presence_coalescer.stats.items()}
+))
+metrics.register(CallbackMetric(
+    "hoshikuzu_user_cache_total", "Recherches dans le cache utilisateurs par issue", "counter", ("result",),
+    lambda: {(result,): count for result, count in user_cache.stats.items()}
+))
+
+# -------------------- Keep-alive / santé (Render) --------------------
+HEALTH_PORT = env_int("PORT", 8080)
+HEALTH_MAX_LATENCY = env_float("HEALTH_MAX_LATENCY", 10.0)  # secondes de latence gateway tolérées
+
+class HealthServer:
+    """Serveur HTTP asynchrone sur la boucle du bot : / (keep-alive) et /healthz"""
+    def __init__(self, port: int):
+        self.port = port
+        self.loop_lag = 0.0
+        self._runner: Optional[web.AppRunner] = None
+        self._monitor: Optional[asyncio.Task] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/", self.index)
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/metrics", self.metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "0.0.0.0", self.port).start()
+        self._monitor = asyncio.create_task(self._measure_loop_lag())
+        print(f"[keep-alive] HTTP server running on port {self.port}")
+
+    async def stop(self):
+        if self._monitor:
+            self._monitor.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _measure_loop_lag(self):
+        """Retard de la boucle d'événements : un handler bloquant se voit ici"""
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(1.0)
+            self.loop_lag = max(0.0, time.monotonic() - start - 1.0)
+
+    async def index(self, request: web.Request) -> web.Response:
+        return web.Response(text="OK")
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=metrics.expose(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def healthz(self, request: web.Request) -> web.Response:
+        report = health_report(self.loop_lag)
+        return web.json_response(report, status=200 if report["healthy"] else 503)
+
+def queue_depths() -> Dict[str, int]:
+    """Profondeur des files internes du bot"""
+    return {
+        "presence_pending": presence_coalescer.pending,
+        "join_pending": sum(pipeline.pending for pipeline in join_pipelines.values()),
+        "config_dirty": config_writer.pending,
+        "status_sweep_remaining": status_sweep_job.remaining if status_sweep_job and not status_sweep_job.finished else 0,
+        "scheduled_in_memory": action_scheduler.in_memory,
+    }
+
+def health_report(loop_lag: float = 0.0) -> Dict[str, Any]:
+    """État du bot pour le répartiteur de charge"""
+    def finite(value: float) -> Optional[float]:
+        return round(value, 4) if value == value and value not in (float("inf"), float("-inf")) else None
+    
+    shards = {}
+    if getattr(bot, "shards", None):
+        for shard_id, shard in bot.shards.items():
+            shards[str(shard_id)] = {"ready": not shard.is_closed(), "latency": finite(shard.latency)}
+    else:
+        shards[str(bot.shard_id or 0)] = {"ready": bot.is_ready() and not bot.is_closed(), "latency": finite(bot.latency)}
+    
+    latency = finite(bot.latency)
+    queues = queue_depths()
+    healthy = (
+        bot.is_ready()
+        and not bot.is_closed()
+        and all(shard["ready"] for shard in shards.values())
+        and latency is not None
+        and latency < HEALTH_MAX_LATENCY
+    )
+    return {
+        "healthy": healthy,
+        "latency": latency,
+        "loop_lag": round(loop_lag, 4),
+        "guilds": len(bot.guilds),
+        "cluster": CLUSTER_ID,
+        "shards": shards,
+        "queues": queues,
+        "startup": {name: round(value, 2) for name, value in startup_stats.items() if name != "baseline_rss"},
+        "memory": memory_report(),
+    }
+
+health_server = HealthServer(HEALTH_PORT)
+
+# -------------------- Sharding et cluster --------------------
+def parse_shard_ids(text: str) -> Optional[List[int]]:
+    """Lit une liste de shards du type "0-3,8" (None = tous les shards)"""
+    ids = set()
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        ids.update(range(int(start), int(end or start) + 1))
+    return sorted(ids) or None
+
+def format_shard_ids(shard_ids: Iterable[int]) -> str:
+    """Inverse de parse_shard_ids : [0, 1, 2, 3, 8] -> "0-3,8" """
+    ranges = []
+    for shard_id in sorted(shard_ids):
+        if ranges and shard_id == ranges[-1][1] + 1:
+            ranges[-1][1] = shard_id
+        else:
+            ranges.append([shard_id, shard_id])
+    return ",".join(str(start) if start == end else f"{start}-{end}" for start, end in ranges)
+
+def shard_options() -> Dict[str, Any]:
+    """Arguments de sharding du bot selon SHARD_COUNT / SHARD_IDS"""
+    if SHARD_COUNT <= 0:
+        return {}
+    shard_ids = parse_shard_ids(SHARD_IDS)
+    invalid = [shard_id for shard_id in shard_ids or () if shard_id >= SHARD_COUNT]
+    if invalid:
+        raise ValueError(f"SHARD_IDS hors limites pour SHARD_COUNT={SHARD_COUNT} : {invalid}")
+    return {"shard_count": SHARD_COUNT, "shard_ids": shard_ids}
+
+def split_shards(shard_count: int, workers: int) -> List[List[int]]:
+    """Répartit les shards en groupes contigus de tailles équilibrées"""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+    groups, start = [], 0
+    for index in range(workers):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
+async def fetch_recommended_shards(token: str) -> int:
+    """Nombre de shards recommandé par Discord (GET /gateway/bot)"""
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(token)
+        shard_count, _ = await http.get_bot_gateway()
+        return shard_count
+    finally:
+        await http.close()
+
+def run_cluster(token: str, workers: int) -> int:
+    """Lanceur : répartit les shards sur plusieurs processus et relance ceux qui s'arrêtent"""
+    shard_count = SHARD_COUNT or asyncio.run(fetch_recommended_shards(token))
+    groups = split_shards(shard_count, workers)
+    print(f"[CLUSTER] 🧩 {shard_count} shard(s) répartis sur {len(groups)} processus")
+
+    processes: List[Optional[subprocess.Popen]] = [None] * len(groups)
+    restarts = [0] * len(groups)
+    stopping = False
 
-    with socketserver.TCPServer(("", port), QuietHandler) as httpd:
-        print(f"[keep-alive] HTTP server running on port {port}")
-        httpd.serve_forever()
+    def spawn(index: int) -> subprocess.Popen:
+        env = dict(os.environ)
+        env.pop("CLUSTER_PROCESSES", None)
+        env.update(
+            SHARD_COUNT=str(shard_count),
+            SHARD_IDS=format_shard_ids(groups[index]),
+            CLUSTER_ID=str(index),
+            PORT=str(HEALTH_PORT + index),
+        )
+        print(f"[CLUSTER] ▶️ Processus {index} : shards {env['SHARD_IDS']} (port {env['PORT']})")
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+
+    def wait(seconds: float):
+        deadline = time.monotonic() + seconds
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(0.5)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
 
-threading.Thread(target=keep_alive, daemon=True).start()
+    # Démarrages espacés : Discord limite le nombre d'identifications simultanées
+    for index, group in enumerate(groups):
+        if stopping:
+            break
+        processes[index] = spawn(index)
+        if index < len(groups) - 1:
+            wait(len(group) * CLUSTER_IDENTIFY_DELAY)
+
+    while not stopping:
+        wait(1.0)
+        for index, process in enumerate(processes):
+            if stopping or process is None or process.poll() is None:
+                continue
+            restarts[index] += 1
+            delay = min(60.0, CLUSTER_IDENTIFY_DELAY * 2 ** min(restarts[index], 4))
+            print(f"[CLUSTER] ⚠️ Processus {index} arrêté (code {process.returncode}), relance dans {delay:.0f}s")
+            wait(delay)
+            if not stopping:
+                processes[index] = spawn(index)
+
+    for process in processes:
+        if process is not None:
+            process.wait()
+    print("[CLUSTER] 🛑 Tous les processus sont arrêtés")
+    return 0
 
 # -------------------- Bot init --------------------
 intents = discord.Intents.default()
@@ -35,29 +589,658 @@ intents.members = True
 intents.guilds = True
 intents.presences = True
 
-bot = commands.Bot(command_prefix="+", intents=intents, help_command=None)
+# Plusieurs connexions gateway dans ce processus dès que SHARD_COUNT est défini
+BotBase = commands.AutoShardedBot if SHARD_COUNT > 0 else commands.Bot
+
+class HoshikuzuBot(BotBase):
+    async def setup_hook(self):
+        startup_stats["baseline_rss"] = resident_memory() or 0
+        instrument_http(self.http)
+        config_writer.start()
+        await health_server.start()
+        try:
+            self.loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows : pas de gestionnaire de signaux dans la boucle
+    
+    async def close(self):
+        # Écrit les configurations en attente avant de fermer la connexion
+        await config_writer.close()
+        await action_scheduler.stop()
+        await health_server.stop()
+        await super().close()
+
+# Pas de cache vocal (inutilisé) ; les membres arrivés restent en cache
+member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+member_cache_flags.voice = False
+
+bot = HoshikuzuBot(
+    command_prefix="+", intents=intents, help_command=None,
+    chunk_guilds_at_startup=STARTUP_CHUNKING == "all",
+    member_cache_flags=member_cache_flags,
+    **shard_options()
+)
 
 # -------------------- Configuration storage --------------------
+DATABASE_FILE = os.environ.get("HOSHIKUZU_DB", "hoshikuzu.db")
 STATUS_CONFIG_FILE = "status_roles.json"
 VERIFICATION_CONFIG_FILE = "verification_config.json"
+BOT_DATA_FILE = "bot_data.json"
+
+def open_database(path: str, row_factory: Optional[Callable] = None) -> sqlite3.Connection:
+    """Connexion SQLite partageable entre threads (protégée par le verrou de l'appelant), en mode WAL"""
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = row_factory
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+class ConfigStorage:
+    """Base SQLite des configurations : une ligne JSON par (espace de noms, serveur)"""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = open_database(path)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS guild_config ("
+                "namespace TEXT NOT NULL, guild_id TEXT NOT NULL, data TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, guild_id)) WITHOUT ROWID"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY, applied_at REAL NOT NULL)")
+
+    def guild_ids(self, namespace: str) -> Set[str]:
+        with self._lock:
+            rows = self.conn.execute("SELECT guild_id FROM guild_config WHERE namespace = ?", (namespace,))
+            return {guild_id for (guild_id,) in rows}
 
-def load_config(filename):
-    """Charge une configuration depuis un fichier JSON"""
+    def get(self, namespace: str, guild_id: str) -> Optional[Any]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data FROM guild_config WHERE namespace = ? AND guild_id = ?", (namespace, guild_id)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def write_many(self, rows: Iterable[Tuple[str, str, Optional[str]]]):
+        """Écrit (ou supprime si data est None) plusieurs lignes dans une seule transaction"""
+        now = time.time()
+        with self._lock, self.conn:
+            for namespace, guild_id, data in rows:
+                if data is None:
+                    self.conn.execute("DELETE FROM guild_config WHERE namespace = ? AND guild_id = ?", (namespace, guild_id))
+                else:
+                    self.conn.execute(
+                        "INSERT INTO guild_config (namespace, guild_id, data, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (namespace, guild_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                        (namespace, guild_id, data, now)
+                    )
+
+    def migrate(self, name: str, rows: Callable[[], Iterable[Tuple[str, str, Any]]]) -> bool:
+        """Applique une migration une seule fois, de manière atomique"""
+        with self._lock, self.conn:
+            # Verrou d'écriture immédiat : plusieurs processus du cluster peuvent démarrer en même temps
+            self.conn.execute("BEGIN IMMEDIATE")
+            if self.conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+                return False
+            count = 0
+            for namespace, guild_id, data in rows():
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO guild_config (namespace, guild_id, data, updated_at) VALUES (?, ?, ?, ?)",
+                    (namespace, str(guild_id), json.dumps(data, ensure_ascii=False), time.time())
+                )
+                count += 1
+            self.conn.execute("INSERT INTO migrations (name, applied_at) VALUES (?, ?)", (name, time.time()))
+        print(f"[STORAGE] Migration {name} : {count} entrée(s) importée(s)")
+        return True
+
+class GuildConfig(MutableMapping):
+    """Dictionnaire guild_id -> configuration, chargé serveur par serveur à la demande"""
+    def __init__(self, storage: ConfigStorage, namespace: str):
+        self.storage = storage
+        self.namespace = namespace
+        self._known = storage.guild_ids(namespace)
+        self._cache: Dict[str, Any] = {}
+
+    def __contains__(self, guild_id) -> bool:
+        return guild_id in self._known
+
+    def __getitem__(self, guild_id: str) -> Any:
+        if guild_id not in self._known:
+            raise KeyError(guild_id)
+        try:
+            return self._cache[guild_id]
+        except KeyError:
+            pass
+        with trace_span("lecture configuration (SQLite)"):
+            value = self.storage.get(self.namespace, guild_id)
+        if value is None:
+            self._known.discard(guild_id)
+            raise KeyError(guild_id)
+        self._cache[guild_id] = value
+        return value
+
+    def __setitem__(self, guild_id: str, value: Any):
+        self._known.add(guild_id)
+        self._cache[guild_id] = value
+
+    def __delitem__(self, guild_id: str):
+        if guild_id not in self._known:
+            raise KeyError(guild_id)
+        self._known.discard(guild_id)
+        self._cache.pop(guild_id, None)
+
+    def __iter__(self):
+        return iter(list(self._known))
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+def read_json_file(filename: str) -> Dict[str, Any]:
+    """Lit un ancien fichier JSON de configuration"""
     if os.path.exists(filename):
         try:
             with open(filename, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
         except:
             pass
     return {}
 
-def save_config(config, filename):
-    """Sauvegarde une configuration dans un fichier JSON"""
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=2, ensure_ascii=False)
+def migrate_bot_data(storage: ConfigStorage):
+    """Importe une seule fois les sections de bot_data.json (une section = un espace de noms)"""
+    def rows():
+        for section, entries in read_json_file(BOT_DATA_FILE).items():
+            if isinstance(entries, dict):
+                for guild_id, data in entries.items():
+                    yield section, guild_id, data
+    storage.migrate(f"json:{BOT_DATA_FILE}", rows)
+
+def load_config(namespace: str, legacy_file: Optional[str] = None) -> GuildConfig:
+    """Charge une configuration depuis la base (en important l'ancien fichier JSON au premier lancement)"""
+    if legacy_file:
+        storage.migrate(
+            f"json:{legacy_file}",
+            lambda: ((namespace, guild_id, data) for guild_id, data in read_json_file(legacy_file).items())
+        )
+    return GuildConfig(storage, namespace)
+
+class ConfigWriter:
+    """Persistance différée : les serveurs modifiés sont écrits par lots dans un thread"""
+    def __init__(self, storage: ConfigStorage, interval: float):
+        self.storage = storage
+        self.interval = interval
+        self._dirty: Dict[Tuple[str, str], GuildConfig] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.stats = {"marked": 0, "rows_written": 0, "flushes": 0}
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def mark_dirty(self, config: GuildConfig, guild_id: str):
+        self._dirty[(config.namespace, guild_id)] = config
+        self.stats["marked"] += 1
+
+    def _snapshot(self) -> Tuple[Dict[Tuple[str, str], GuildConfig], List[Tuple[str, str, Optional[str]]]]:
+        """Sérialise les serveurs modifiés (sur la boucle, pour une copie cohérente)"""
+        dirty, self._dirty = self._dirty, {}
+        rows = []
+        for (namespace, guild_id), config in dirty.items():
+            data = json.dumps(config[guild_id], ensure_ascii=False) if guild_id in config else None
+            rows.append((namespace, guild_id, data))
+        return dirty, rows
+
+    def _write(self, rows: List[Tuple[str, str, Optional[str]]]):
+        self.storage.write_many(rows)
+        self.stats["rows_written"] += len(rows)
+        self.stats["flushes"] += 1
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            dirty, rows = self._snapshot()
+            if not rows:
+                return
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._write, rows)
+            except Exception as e:
+                print(f"[STORAGE] Erreur écriture configuration: {e}")
+                # Remet en attente les serveurs qui n'ont pas été modifiés entre-temps
+                for key, config in dirty.items():
+                    self._dirty.setdefault(key, config)
+
+    def flush_sync(self):
+        """Écriture bloquante de dernier recours (arrêt du processus)"""
+        _, rows = self._snapshot()
+        if rows:
+            self._write(rows)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+def save_config(config: GuildConfig, guild_id: str):
+    """Marque la configuration d'un serveur comme modifiée (écrite en arrière-plan)"""
+    config_writer.mark_dirty(config, guild_id)
+
+storage = ConfigStorage(DATABASE_FILE)
+config_writer = ConfigWriter(storage, CONFIG_FLUSH_INTERVAL)
+atexit.register(config_writer.flush_sync)
+migrate_bot_data(storage)
+status_config = load_config("status_roles", STATUS_CONFIG_FILE)
+verification_config = load_config("verification", VERIFICATION_CONFIG_FILE)
+
+# -------------------- Historique des sanctions --------------------
+CASE_ACTIONS = {
+    "warn": "⚠️ Avertissement",
+    "kick": "👢 Expulsion",
+    "ban": "⛔ Bannissement",
+    "unban": "✅ Débannissement",
+    "mute": "🔇 Timeout",
+    "unmute": "🔊 Fin de timeout",
+}
+
+class CaseStore:
+    """Sanctions en SQLite : numéro par serveur, index par membre, modérateur et date"""
+    # Index imposés : sans statistiques, SQLite préfère parcourir la clé primaire pour respecter l'ORDER BY
+    FILTER_INDEXES = {"user_id": "mod_cases_user", "moderator_id": "mod_cases_moderator"}
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self.conn = open_database(path, sqlite3.Row)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS mod_cases ("
+                "guild_id INTEGER NOT NULL, case_number INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+                "moderator_id INTEGER NOT NULL, action TEXT NOT NULL, reason TEXT, duration INTEGER, created_at REAL NOT NULL, "
+                "PRIMARY KEY (guild_id, case_number)) WITHOUT ROWID"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS mod_cases_user ON mod_cases (guild_id, user_id, case_number)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS mod_cases_moderator ON mod_cases (guild_id, moderator_id, case_number)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS mod_cases_created ON mod_cases (guild_id, created_at)")
+
+    def add_many(self, guild_id: int, moderator_id: int, action: str, user_ids: List[int],
+                 reason: Optional[str] = None, duration: Optional[int] = None) -> List[int]:
+        """Enregistre une sanction par membre dans une seule transaction ; retourne les numéros attribués"""
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            (last,) = self.conn.execute(
+                "SELECT COALESCE(MAX(case_number), 0) FROM mod_cases WHERE guild_id = ?", (guild_id,)
+            ).fetchone()
+            numbers = list(range(last + 1, last + 1 + len(user_ids)))
+            self.conn.executemany(
+                "INSERT INTO mod_cases (guild_id, case_number, user_id, moderator_id, action, reason, duration, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(guild_id, number, user_id, moderator_id, action, reason, duration, now)
+                 for number, user_id in zip(numbers, user_ids)]
+            )
+        return numbers
+
+    def get(self, guild_id: int, case_number: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM mod_cases WHERE guild_id = ? AND case_number = ?", (guild_id, case_number)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def page(self, guild_id: int, column: Optional[str] = None, value: Optional[int] = None,
+             before: Optional[int] = None, after: Optional[int] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Page de sanctions (plus récentes d'abord) par pagination sur le numéro : before/after = bornes exclues"""
+        where, params, table = ["guild_id = ?"], [guild_id], "mod_cases"
+        if column is not None:
+            if column not in self.FILTER_INDEXES:
+                raise ValueError(column)
+            where.append(f"{column} = ?")
+            params.append(value)
+            table = f"mod_cases INDEXED BY {self.FILTER_INDEXES[column]}"
+        if before is not None:
+            where.append("case_number < ?")
+            params.append(before)
+        if after is not None:
+            where.append("case_number > ?")
+            params.append(after)
+        order = "ASC" if after is not None else "DESC"
+        query = f"SELECT * FROM {table} WHERE {' AND '.join(where)} ORDER BY case_number {order} LIMIT ?"
+        with self._lock:
+            rows = [dict(row) for row in self.conn.execute(query, (*params, limit))]
+        return rows[::-1] if order == "ASC" else rows
+
+    def count(self, guild_id: int, column: Optional[str] = None, value: Optional[int] = None, since: Optional[float] = None) -> int:
+        """Nombre de sanctions ; les comptages filtrés ne parcourent que la plage de leur index"""
+        if column is None and since is None:
+            # Numéros attribués sans trou ni suppression : le total est le dernier numéro (une descente de la clé primaire)
+            with self._lock:
+                (total,) = self.conn.execute(
+                    "SELECT COALESCE(MAX(case_number), 0) FROM mod_cases WHERE guild_id = ?", (guild_id,)
+                ).fetchone()
+            return total
+        where, params, table = ["guild_id = ?"], [guild_id], "mod_cases"
+        if column is not None:
+            if column not in self.FILTER_INDEXES:
+                raise ValueError(column)
+            where.append(f"{column} = ?")
+            params.append(value)
+            table = f"mod_cases INDEXED BY {self.FILTER_INDEXES[column]}"
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        with self._lock:
+            (total,) = self.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {' AND '.join(where)}", params).fetchone()
+        return total
+
+case_store = CaseStore(DATABASE_FILE)
+
+async def run_case_query(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Exécute une opération de l'historique dans un thread (la boucle n'attend jamais SQLite)"""
+    with trace_span("historique des sanctions (SQLite)"):
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+async def record_cases(ctx: commands.Context, user_ids: List[int], action: str,
+                       reason: Optional[str] = None, duration: Optional[int] = None) -> List[int]:
+    """Enregistre les sanctions d'une commande ; une erreur de base n'annule pas la sanction déjà appliquée"""
+    if not user_ids:
+        return []
+    try:
+        return await run_case_query(case_store.add_many, ctx.guild.id, ctx.author.id, action, user_ids, reason, duration)
+    except sqlite3.Error as e:
+        print(f"[CASES] Erreur enregistrement {action}: {e}")
+        return []
+
+async def record_case(ctx: commands.Context, user_id: int, action: str,
+                      reason: Optional[str] = None, duration: Optional[int] = None) -> Optional[int]:
+    numbers = await record_cases(ctx, [user_id], action, reason, duration)
+    return numbers[0] if numbers else None
+
+def with_case(embed: discord.Embed, case_numbers: Union[Optional[int], List[int]]) -> discord.Embed:
+    """Ajoute le(s) numéro(s) de sanction en pied d'embed"""
+    if isinstance(case_numbers, list):
+        if len(case_numbers) > 1:
+            embed.set_footer(text=f"Sanctions #{case_numbers[0]} à #{case_numbers[-1]}")
+            return embed
+        case_numbers = case_numbers[0] if case_numbers else None
+    if case_numbers:
+        embed.set_footer(text=f"Sanction #{case_numbers}")
+    return embed
+
+# -------------------- Actions planifiées --------------------
+class ScheduledActionStore:
+    """Actions planifiées en SQLite (débannissements, fins de mute, rôles temporaires), lues par ordre d'échéance"""
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self.conn = open_database(path, sqlite3.Row)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS scheduled_actions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, action TEXT NOT NULL, "
+                "user_id INTEGER NOT NULL, role_id INTEGER, due_at REAL NOT NULL, reason TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS scheduled_actions_due ON scheduled_actions (due_at)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS scheduled_actions_target ON scheduled_actions (guild_id, user_id, action)")
+
+    def add(self, guild_id: int, action: str, user_id: int, role_id: Optional[int], due_at: float,
+            reason: Optional[str]) -> Tuple[Dict[str, Any], List[int]]:
+        """Planifie une action en remplaçant celle déjà prévue pour la même cible ; retourne (action, ids remplacés)"""
+        with self._lock, self.conn:
+            replaced = [action_id for (action_id,) in self.conn.execute(
+                "SELECT id FROM scheduled_actions WHERE guild_id = ? AND user_id = ? AND action = ? AND role_id IS ?",
+                (guild_id, user_id, action, role_id)
+            )]
+            self.conn.executemany("DELETE FROM scheduled_actions WHERE id = ?", [(action_id,) for action_id in replaced])
+            cursor = self.conn.execute(
+                "INSERT INTO scheduled_actions (guild_id, action, user_id, role_id, due_at, reason, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (guild_id, action, user_id, role_id, due_at, reason, time.time())
+            )
+            row = self.conn.execute("SELECT * FROM scheduled_actions WHERE id = ?", (cursor.lastrowid,)).fetchone()
+        return dict(row), replaced
+
+    def cancel(self, guild_id: int, user_id: int, action: str) -> List[int]:
+        """Supprime les actions prévues pour une cible ; retourne leurs ids"""
+        with self._lock, self.conn:
+            ids = [action_id for (action_id,) in self.conn.execute(
+                "SELECT id FROM scheduled_actions WHERE guild_id = ? AND user_id = ? AND action = ?",
+                (guild_id, user_id, action)
+            )]
+            self.conn.executemany("DELETE FROM scheduled_actions WHERE id = ?", [(action_id,) for action_id in ids])
+        return ids
+
+    def delete(self, action_id: int):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM scheduled_actions WHERE id = ?", (action_id,))
+
+    def retry(self, action_id: int, due_at: float, attempts: int):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE scheduled_actions SET due_at = ?, attempts = ? WHERE id = ?", (due_at, attempts, action_id))
+
+    def window(self, after: Tuple[float, int], until: float, limit: int,
+               shards: Optional[Tuple[int, List[int]]] = None) -> List[Dict[str, Any]]:
+        """Actions d'échéance comprise entre le curseur (exclu) et `until`, triées par (échéance, id)"""
+        where, params = ["(due_at, id) > (?, ?)", "due_at <= ?"], [after[0], after[1], until]
+        if shards is not None:
+            shard_count, shard_ids = shards
+            where.append(f"((guild_id >> 22) % ?) IN ({', '.join('?' * len(shard_ids))})")
+            params.extend((shard_count, *shard_ids))
+        query = f"SELECT * FROM scheduled_actions WHERE {' AND '.join(where)} ORDER BY due_at, id LIMIT ?"
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(query, (*params, limit))]
+
+    def count(self) -> int:
+        with self._lock:
+            (total,) = self.conn.execute("SELECT COUNT(*) FROM scheduled_actions").fetchone()
+        return total
+
+def owned_shards() -> Optional[Tuple[int, List[int]]]:
+    """(nombre de shards, shards de ce processus) ou None si le processus gère tous les serveurs"""
+    shard_ids = getattr(bot, "shard_ids", None)
+    if not bot.shard_count or bot.shard_count <= 1 or not shard_ids:
+        return None
+    return bot.shard_count, list(shard_ids)
+
+def owns_guild(guild_id: int) -> bool:
+    """Le serveur dépend-il d'un shard de ce processus ?"""
+    shards = owned_shards()
+    return shards is None or (guild_id >> 22) % shards[0] in shards[1]
+
+async def execute_scheduled_action(action: Dict[str, Any]) -> str:
+    """Exécute une action arrivée à échéance ; retourne son issue"""
+    guild = bot.get_guild(action["guild_id"])
+    if guild is None or guild.unavailable:
+        # Panne Discord ou serveur pas encore reçu : l'action attend son retour
+        return "guild_unavailable"
+    reason = action["reason"] or "Fin de sanction temporaire"
+
+    if action["action"] == "unban":
+        try:
+            await guild.unban(discord.Object(id=action["user_id"]), reason=reason)
+        except discord.NotFound:
+            return "noop"  # Déjà débanni
+    elif action["action"] in ("unmute", "remove_role"):
+        role = guild.get_role(action["role_id"])
+        member = guild.get_member(action["user_id"])
+        if member is None:
+            try:
+                member = await guild.fetch_member(action["user_id"])
+            except discord.NotFound:
+                return "noop"  # Parti du serveur : il a perdu ses rôles
+        if role is None or member.get_role(role.id) is None:
+            return "noop"
+        await remove_member_roles(member, role, reason=reason)
+    else:
+        return "unknown"
+
+    if action["action"] in CASE_ACTIONS and bot.user:
+        try:
+            await run_case_query(case_store.add_many, guild.id, bot.user.id, action["action"], [action["user_id"]], reason)
+        except sqlite3.Error as e:
+            # La sanction est déjà levée : une erreur d'historique ne doit pas bloquer l'action
+            print(f"[CASES] Erreur enregistrement {action['action']}: {e}")
+    return "done"
+
+class ActionScheduler:
+    """Une seule tâche pour toutes les actions planifiées : tas en mémoire pour l'heure à venir, SQLite pour le reste"""
+    MAX_ID = 2 ** 63 - 1
+
+    def __init__(self, store: ScheduledActionStore, horizon: float, batch: int):
+        self.store = store
+        self.horizon = horizon
+        self.batch = batch
+        self._heap: List[Tuple[float, int]] = []
+        self._loaded: Dict[int, Dict[str, Any]] = {}
+        # Tout ce qui est planifié avant le curseur (échéance, id) est en mémoire
+        self._cursor: Tuple[float, int] = (0.0, 0)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"scheduled": 0, "done": 0, "noop": 0, "failed": 0, "retried": 0, "deferred": 0, "cancelled": 0}
 
-status_config = load_config(STATUS_CONFIG_FILE)
-verification_config = load_config(VERIFICATION_CONFIG_FILE)
+    @property
+    def in_memory(self) -> int:
+        return len(self._loaded)
+
+    async def _db(self, func: Callable[..., Any], *args) -> Any:
+        with trace_span("actions planifiées (SQLite)"):
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def _push(self, action: Dict[str, Any]):
+        self._loaded[action["id"]] = action
+        heapq.heappush(self._heap, (action["due_at"], action["id"]))
+        if self._heap[0][1] == action["id"]:
+            self._wakeup.set()
+
+    async def schedule(self, guild_id: int, action: str, user_id: int, due_at: float,
+                       role_id: Optional[int] = None, reason: Optional[str] = None) -> Dict[str, Any]:
+        """Planifie une action (persistée avant de rendre la main)"""
+        row, replaced = await self._db(self.store.add, guild_id, action, user_id, role_id, due_at, reason)
+        for action_id in replaced:
+            self._loaded.pop(action_id, None)
+        self.stats["scheduled"] += 1
+        if (row["due_at"], row["id"]) <= self._cursor:
+            self._push(row)
+        return row
+
+    async def cancel(self, guild_id: int, user_id: int, action: str) -> int:
+        """Annule les actions prévues pour une cible (les entrées du tas sont ignorées à l'échéance)"""
+        ids = await self._db(self.store.cancel, guild_id, user_id, action)
+        for action_id in ids:
+            self._loaded.pop(action_id, None)
+        self.stats["cancelled"] += len(ids)
+        return len(ids)
+
+    async def pending(self) -> int:
+        return await self._db(self.store.count)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _refill(self):
+        """Charge en mémoire les prochaines échéances de la fenêtre (par lots, reprise au curseur)"""
+        until = time.time() + self.horizon
+        rows = await self._db(self.store.window, self._cursor, until, self.batch, owned_shards())
+        for row in rows:
+            if row["id"] not in self._loaded:
+                self._push(row)
+        if len(rows) == self.batch:
+            self._cursor = (rows[-1]["due_at"], rows[-1]["id"])
+        else:
+            self._cursor = (until, self.MAX_ID)
+
+    async def _run(self):
+        while True:
+            try:
+                if self._cursor[0] < time.time() + self.horizon / 2:
+                    await self._refill()
+
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now and len(due) < self.batch:
+                    _, action_id = heapq.heappop(self._heap)
+                    action = self._loaded.pop(action_id, None)
+                    if action is not None:  # None : annulée ou remplacée
+                        due.append(action)
+                if due:
+                    await run_bounded(due, self._execute, concurrency=SCHEDULER_WORKERS)
+                    continue
+
+                next_due = self._heap[0][0] if self._heap else float("inf")
+                next_refill = self._cursor[0] - self.horizon / 2
+                delay = max(0.0, min(next_due, next_refill) - time.time())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[SCHEDULER] Erreur: {e}")
+                await asyncio.sleep(SCHEDULER_RETRY_DELAY)
+
+    async def _requeue(self, action: Dict[str, Any], due_at: float, attempts: int):
+        await self._db(self.store.retry, action["id"], due_at, attempts)
+        action.update(due_at=due_at, attempts=attempts)
+        if (due_at, action["id"]) <= self._cursor:
+            self._push(action)
+
+    async def _execute(self, action: Dict[str, Any]):
+        try:
+            await self._execute_once(action)
+        except Exception as e:
+            # Base indisponible (suppression ou replanification impossible) : l'action reste en mémoire et sera retentée
+            print(f"[SCHEDULER] Erreur {action['action']} de {action['user_id']}: {e}")
+            action["due_at"] = time.time() + SCHEDULER_RETRY_DELAY
+            self._push(action)
+
+    async def _execute_once(self, action: Dict[str, Any]):
+        if not owns_guild(action["guild_id"]):
+            return  # Serveur d'un autre processus du cluster : c'est lui qui exécute et supprime l'action
+        try:
+            outcome = await execute_scheduled_action(action)
+        except discord.Forbidden:
+            outcome = "failed"
+            print(f"[SCHEDULER] Permission refusée : {action['action']} de {action['user_id']} sur {action['guild_id']}")
+        except Exception as e:
+            # Erreur REST, réseau ou inattendue : nouvelle tentative, puis abandon après SCHEDULER_MAX_ATTEMPTS
+            attempts = action["attempts"] + 1
+            if attempts < SCHEDULER_MAX_ATTEMPTS:
+                await self._requeue(action, time.time() + SCHEDULER_RETRY_DELAY * 2 ** (attempts - 1), attempts)
+                self.stats["retried"] += 1
+                return
+            outcome = "failed"
+            print(f"[SCHEDULER] Abandon après {attempts} tentatives : {action['action']} de {action['user_id']} ({e})")
+        if outcome == "guild_unavailable":
+            # Jamais abandonnée : attente doublée à chaque essai (plafonnée à l'horizon), sans compter comme un échec
+            waits = action.get("waits", 0) + 1
+            delay = min(SCHEDULER_RETRY_DELAY * 2 ** (waits - 1), SCHEDULER_HORIZON)
+            await self._requeue(action, time.time() + delay, action["attempts"])
+            action["waits"] = waits
+            self.stats["deferred"] += 1
+            return
+        self.stats["done" if outcome == "done" else "failed" if outcome == "failed" else "noop"] += 1
+        await self._db(self.store.delete, action["id"])
+
+action_scheduler = ActionScheduler(ScheduledActionStore(DATABASE_FILE), SCHEDULER_HORIZON, SCHEDULER_BATCH)
 
 # -------------------- Liste des rôles à créer --------------------
 ROLES_TO_CREATE = [
@@ -141,8 +1324,154 @@ def parse_duration(s: str) -> Optional[int]:
         pass
     return None
 
-async def fetch_user_or_member(ctx: commands.Context, user_str: str) -> Optional[Union[discord.Member, discord.User]]:
-    """Try to find a member/user from mention, ID, or name"""
+class AsyncTTLCache:
+    """Cache LRU asynchrone à expiration : résultats négatifs inclus, requêtes simultanées fusionnées"""
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Any, asyncio.Task] = {}
+        self.stats = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: Any, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Retourne la valeur en cache, sinon appelle `loader` (None = résultat négatif)"""
+        entry = self._data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.stats["hits" if value is not None else "negative_hits"] += 1
+                return value
+            del self._data[key]
+        
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["misses"] += 1
+            task = self._inflight[key] = asyncio.ensure_future(self._load(key, loader))
+        else:
+            self.stats["coalesced"] += 1
+        # shield : l'annulation d'un appelant n'annule pas la requête partagée
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Any, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            ttl = self.ttl if value is not None else self.negative_ttl
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+user_cache = AsyncTTLCache(USER_CACHE_SIZE, USER_CACHE_TTL, USER_CACHE_NEGATIVE_TTL)
+
+async def fetch_user_cached(user_id: int) -> Optional[discord.User]:
+    """Récupère un utilisateur (cache du gateway, puis cache REST) ; None si l'ID est inconnu"""
+    user = bot.get_user(user_id)
+    if user:
+        return user
+    
+    async def load() -> Optional[discord.User]:
+        try:
+            return await bot.fetch_user(user_id)
+        except discord.NotFound:
+            return None
+    
+    return await user_cache.get(user_id, load)
+
+class AmbiguousMember(commands.CommandError):
+    """Plusieurs membres correspondent au nom recherché"""
+    def __init__(self, query: str, members: List[discord.Member]):
+        super().__init__(f"Plusieurs membres correspondent à {query!r}")
+        self.query = query
+        self.members = members
+
+class MemberNameIndex:
+    """Index des noms (casefold) d'un serveur : recherche exacte en O(1), par préfixe en O(log n)"""
+    def __init__(self, members: Iterable[discord.Member]):
+        self._by_name: Dict[str, Set[int]] = {}
+        self._names_by_member: Dict[int, Tuple[str, ...]] = {}
+        for member in members:
+            names = self._names(member)
+            self._names_by_member[member.id] = names
+            for name in names:
+                self._by_name.setdefault(name, set()).add(member.id)
+        self._sorted = sorted(self._by_name)
+
+    @staticmethod
+    def _names(member: Union[discord.Member, discord.User]) -> Tuple[str, ...]:
+        names = {member.name.casefold(), member.display_name.casefold()}
+        if member.global_name:
+            names.add(member.global_name.casefold())
+        return tuple(names)
+
+    def add(self, member: discord.Member):
+        names = self._names(member)
+        if self._names_by_member.get(member.id) == names:
+            return
+        self.remove(member.id)
+        self._names_by_member[member.id] = names
+        for name in names:
+            ids = self._by_name.get(name)
+            if ids is None:
+                ids = self._by_name[name] = set()
+                bisect.insort(self._sorted, name)
+            ids.add(member.id)
+
+    def remove(self, member_id: int):
+        for name in self._names_by_member.pop(member_id, ()):
+            ids = self._by_name.get(name)
+            if ids is None:
+                continue
+            ids.discard(member_id)
+            if not ids:
+                del self._by_name[name]
+                index = bisect.bisect_left(self._sorted, name)
+                if index < len(self._sorted) and self._sorted[index] == name:
+                    del self._sorted[index]
+
+    def exact(self, name: str) -> Set[int]:
+        return set(self._by_name.get(name.casefold(), ()))
+
+    def prefix(self, name: str, limit: int = 25) -> Set[int]:
+        """Membres dont un nom commence par `name` (au plus `limit` résultats)"""
+        name = name.casefold()
+        found: Set[int] = set()
+        index = bisect.bisect_left(self._sorted, name)
+        while index < len(self._sorted) and self._sorted[index].startswith(name) and len(found) < limit:
+            found.update(self._by_name[self._sorted[index]])
+            index += 1
+        return found
+
+member_name_indexes: Dict[int, MemberNameIndex] = {}
+
+def get_member_name_index(guild: discord.Guild) -> MemberNameIndex:
+    """Retourne l'index des noms du serveur, construit à la première recherche"""
+    index = member_name_indexes.get(guild.id)
+    if index is None:
+        index = member_name_indexes[guild.id] = MemberNameIndex(guild.members)
+    return index
+
+def find_member_by_name(guild: discord.Guild, name: str, allow_prefix: bool = False) -> Optional[discord.Member]:
+    """Cherche un membre par nom exact (sinon par préfixe unique si allow_prefix) ; lève AmbiguousMember si plusieurs correspondent"""
+    index = get_member_name_index(guild)
+    ids = index.exact(name)
+    if not ids and allow_prefix:
+        ids = index.prefix(name, limit=11)
+    members = [member for member in map(guild.get_member, ids) if member is not None]
+    if len(members) > 1:
+        raise AmbiguousMember(name, members)
+    return members[0] if members else None
+
+async def fetch_user_or_member(ctx: commands.Context, user_str: str, allow_prefix: bool = False) -> Optional[Union[discord.Member, discord.User]]:
+    """Try to find a member/user from mention, ID, or name (name prefix only for read-only or reversible commands)"""
     if user_str.startswith("<@") and user_str.endswith(">"):
         uid = user_str.replace("<@", "").replace("!", "").replace(">", "")
         if uid.isdigit():
@@ -150,7 +1479,9 @@ async def fetch_user_or_member(ctx: commands.Context, user_str: str) -> Optional
             if member:
                 return member
             try:
-                return await bot.fetch_user(int(uid))
+                user = await fetch_user_cached(int(uid))
+                if user:
+                    return user
             except:
                 pass
     
@@ -159,14 +1490,302 @@ async def fetch_user_or_member(ctx: commands.Context, user_str: str) -> Optional
         if member:
             return member
         try:
-            return await bot.fetch_user(int(user_str))
+            user = await fetch_user_cached(int(user_str))
+            if user:
+                return user
         except:
             pass
     
-    member = discord.utils.find(lambda m: m.name.lower() == user_str.lower() or m.display_name.lower() == user_str.lower(), ctx.guild.members)
-    if member:
-        return member
-    return None
+    return find_member_by_name(ctx.guild, user_str, allow_prefix)
+
+class AhoCorasick:
+    """Automate multi-motifs (Aho-Corasick) : trouve tous les motifs en une seule passe sur le texte"""
+    __slots__ = ("_goto", "_fail", "_out")
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[List[str]] = [[]]
+        for pattern in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(pattern)
+        
+        # Liens d'échec calculés en largeur (BFS)
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def iter(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Génère (index de fin, motif) pour chaque occurrence trouvée"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for pattern in out[node]:
+                yield i, pattern
+
+    def findall(self, text: str) -> Set[str]:
+        """Retourne l'ensemble des motifs présents dans le texte"""
+        return {pattern for _, pattern in self.iter(text)}
+
+ROLE_WRITE_SETTLE = 5.0  # secondes pendant lesquelles les rôles écrits priment sur le cache (événement gateway en retard)
+
+class MemberRoleState:
+    """Verrou des écritures de rôles d'un membre et rôles connus après la dernière écriture du bot"""
+    __slots__ = ("lock", "users", "role_ids", "written_at")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+        self.role_ids: Optional[Set[int]] = None
+        self.written_at = 0.0
+
+member_role_states: Dict[Tuple[int, int], MemberRoleState] = {}
+
+def forget_member_role_state(key: Tuple[int, int], state: MemberRoleState):
+    if member_role_states.get(key) is state and not state.users and time.monotonic() >= state.written_at + ROLE_WRITE_SETTLE:
+        del member_role_states[key]
+
+class member_role_lock:
+    """`async with member_role_lock(member) as state` : une seule écriture de rôles à la fois par membre"""
+    def __init__(self, member: discord.Member):
+        self.key = (member.guild.id, member.id)
+        self.state: Optional[MemberRoleState] = None
+
+    async def __aenter__(self) -> MemberRoleState:
+        state = member_role_states.get(self.key)
+        if state is None:
+            state = member_role_states[self.key] = MemberRoleState()
+        state.users += 1
+        try:
+            await state.lock.acquire()
+        except BaseException:
+            state.users -= 1
+            forget_member_role_state(self.key, state)
+            raise
+        self.state = state
+        return state
+
+    async def __aexit__(self, *exc_info):
+        state = self.state
+        state.lock.release()
+        state.users -= 1
+        if not state.users:
+            delay = state.written_at + ROLE_WRITE_SETTLE - time.monotonic()
+            if delay <= 0:
+                forget_member_role_state(self.key, state)
+            else:
+                asyncio.get_running_loop().call_later(delay, forget_member_role_state, self.key, state)
+
+def current_member_roles(member: discord.Member, state: MemberRoleState) -> Tuple[discord.Member, Set[int]]:
+    """(membre le plus récent du cache, ids de ses rôles sans @everyone), lus dans le verrou"""
+    fresh = member.guild.get_member(member.id) or member
+    if state.role_ids is not None and time.monotonic() - state.written_at < ROLE_WRITE_SETTLE:
+        return fresh, set(state.role_ids)
+    return fresh, {role.id for role in fresh.roles if role.id != member.guild.id}
+
+async def apply_role_diff(member: discord.Member, add: Iterable[discord.abc.Snowflake] = (), remove: Iterable[discord.abc.Snowflake] = (),
+                          reason: Optional[str] = None,
+                          plan: Optional[Callable[[discord.Member], Tuple[Iterable[discord.abc.Snowflake], Iterable[discord.abc.Snowflake], str]]] = None) -> bool:
+    """Applique ajouts/retraits de rôles en un seul appel REST (aucun appel si rien ne change)
+    
+    Les écritures d'un même membre sont sérialisées et la liste envoyée est recalculée dans le verrou
+    (`plan` est alors rappelé sur le membre à jour) : une écriture concurrente n'est jamais écrasée."""
+    async with member_role_lock(member) as state:
+        fresh, current_ids = current_member_roles(member, state)
+        if plan is not None:
+            add, remove, reason = plan(fresh)
+        remove_ids = {role.id for role in remove}
+        target_ids = (current_ids - remove_ids) | {role.id for role in add}
+        if target_ids == current_ids:
+            return False
+        target = [member.guild.get_role(role_id) or discord.Object(id=role_id) for role_id in target_ids]
+        await fresh.edit(roles=target, reason=reason[:512] if reason else None)
+        state.role_ids = target_ids
+        state.written_at = time.monotonic()
+        return True
+
+async def add_member_roles(member: discord.Member, *roles: discord.abc.Snowflake, reason: Optional[str] = None):
+    """add_roles (un appel par rôle, sans écraser les autres) sous le verrou de rôles du membre"""
+    async with member_role_lock(member) as state:
+        await member.add_roles(*roles, reason=reason)
+        if state.role_ids is not None:
+            state.role_ids |= {role.id for role in roles}
+
+async def remove_member_roles(member: discord.Member, *roles: discord.abc.Snowflake, reason: Optional[str] = None):
+    """remove_roles sous le verrou de rôles du membre"""
+    async with member_role_lock(member) as state:
+        await member.remove_roles(*roles, reason=reason)
+        if state.role_ids is not None:
+            state.role_ids -= {role.id for role in roles}
+
+class RateLimiter:
+    """Seau à jetons asynchrone : au plus `rate` opérations par fenêtre de `per` secondes"""
+    def __init__(self, rate: int, per: float):
+        self.rate = max(1, rate)
+        self.per = per
+        self._tokens = float(self.rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        with trace_span("attente limiteur"):
+            await self._acquire()
+
+    async def _acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.per)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.per / self.rate)
+
+member_edit_limiters: Dict[int, RateLimiter] = {}
+
+def get_member_edit_limiter(guild_id: int) -> RateLimiter:
+    """Limiteur partagé de la route PATCH /guilds/{guild_id}/members/{member_id}"""
+    limiter = member_edit_limiters.get(guild_id)
+    if limiter is None:
+        limiter = member_edit_limiters[guild_id] = RateLimiter(MEMBER_EDIT_RATE, MEMBER_EDIT_PER)
+    return limiter
+
+async def run_bounded(items: Iterable[Any], handler: Callable[[Any], Awaitable[Any]], concurrency: int) -> List[Any]:
+    """Exécute handler(item) avec au plus `concurrency` appels simultanés ; les exceptions sont retournées"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def run(item):
+        async with semaphore:
+            return await handler(item)
+    
+    return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+class BackgroundJob:
+    """Tâche de fond à concurrence bornée avec suivi de progression"""
+    def __init__(self, name: str, concurrency: int = 4, report_every: float = 10.0,
+                 reporter: Optional[Callable[["BackgroundJob"], Awaitable[None]]] = None):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.report_every = report_every
+        self.reporter = reporter
+        self.total: Optional[int] = None
+        self.done = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self._cancel_requested = False
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_requested
+
+    @property
+    def rate(self) -> float:
+        if not self.started_at:
+            return 0.0
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def remaining(self) -> Optional[int]:
+        return None if self.total is None else max(0, self.total - self.done)
+
+    def progress_text(self) -> str:
+        total = "?" if self.total is None else self.total
+        text = f"{self.done}/{total} ({self.rate:.1f}/s"
+        if self.remaining is not None:
+            text += f", restant: {self.remaining}"
+            if self.rate > 0 and not self.finished:
+                text += f", ~{self.remaining / self.rate:.0f}s"
+        return text + ")"
+
+    def start(self, items: Iterable[Any], handler: Callable[[Any], Awaitable[bool]]) -> asyncio.Task:
+        """Lance le traitement de `items` en arrière-plan ; `handler` retourne True si l'élément a été appliqué"""
+        if self.total is None and hasattr(items, "__len__"):
+            self.total = len(items)
+        self.task = asyncio.create_task(self._run(items, handler), name=self.name)
+        return self.task
+
+    def cancel(self) -> bool:
+        if not self.running:
+            return False
+        self._cancel_requested = True
+        self.task.cancel()
+        return True
+
+    async def _run(self, items: Iterable[Any], handler: Callable[[Any], Awaitable[bool]]):
+        # Tâche détachée : ne pas alimenter la trace du handler qui l'a lancée
+        current_trace.set(None)
+        self.started_at = time.monotonic()
+        iterator = iter(items)
+        
+        async def worker():
+            for item in iterator:
+                try:
+                    if await handler(item):
+                        self.succeeded += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    print(f"[JOB] Erreur {self.name}: {e}")
+                self.done += 1
+                # Rend la main à la boucle même si le handler n'a rien attendu
+                if self.done % 100 == 0:
+                    await asyncio.sleep(0)
+        
+        async def report():
+            while True:
+                await asyncio.sleep(self.report_every)
+                await self._report()
+        
+        reporter = asyncio.create_task(report())
+        try:
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        finally:
+            reporter.cancel()
+            self.finished_at = time.monotonic()
+            await self._report()
+
+    async def _report(self):
+        try:
+            if self.reporter:
+                await self.reporter(self)
+            else:
+                print(f"[JOB] {self.name}: {self.progress_text()}")
+        except Exception as e:
+            print(f"[JOB] Erreur rapport {self.name}: {e}")
 
 def embed_action(color: discord.Color, title: str, description: str) -> discord.Embed:
     e = discord.Embed(title=title, description=description, color=color)
@@ -177,227 +1796,733 @@ def error_embed(title: str, description: str) -> discord.Embed:
     return e
 
 # -------------------- Système de vérification --------------------
-class VerifyButton(discord.ui.View):
-    def __init__(self, user_id: int):
-        super().__init__(timeout=None)
-        self.user_id = user_id
-    
-    @discord.ui.button(label="✅ Me vérifier", style=discord.ButtonStyle.success, custom_id="verify_button")
-    async def verify_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.user_id:
-            return await interaction.response.send_message("❌ Ce bouton n'est pas pour toi !", ephemeral=True)
-        
-        guild_id = str(interaction.guild.id)
-        if guild_id not in verification_config:
-            return await interaction.response.send_message("❌ Configuration manquante !", ephemeral=True)
-        
-        config = verification_config[guild_id]
-        member = interaction.user
-        
-        try:
-            # Retire le rôle non vérifié
-            unverified_role = interaction.guild.get_role(config.get("unverified_role_id"))
-            if unverified_role and unverified_role in member.roles:
-                await member.remove_roles(unverified_role)
-            
-            # Ajoute les rôles vérifiés
-            verified_roles = []
-            for role_id in config.get("verified_role_ids", []):
-                role = interaction.guild.get_role(role_id)
-                if role:
-                    verified_roles.append(role)
-            
-            if verified_roles:
-                await member.add_roles(*verified_roles)
-            
-            roles_names = ", ".join([r.name for r in verified_roles])
-            await interaction.response.send_message(
-                f"✅ **Vérification réussie !**\nTu as reçu les rôles: {roles_names}\nBienvenue sur le serveur ! 🎉",
-                ephemeral=True
-            )
-            
-            # Édite le message original
-            verified_embed = discord.Embed(
-                title="✅ Membre vérifié !",
-                description=f"{member.mention} s'est vérifié avec succès !",
-                color=discord.Color.green()
-            )
-            verified_embed.set_thumbnail(url=member.display_avatar.url)
-            verified_embed.set_footer(text=f"ID: {member.id}")
-            verified_embed.timestamp = datetime.datetime.now()
-            
-            await interaction.message.edit(embed=verified_embed, view=None)
-            
-        except Exception as e:
-            print(f"Erreur vérification: {e}")
-            await interaction.response.send_message("❌ Erreur lors de la vérification.", ephemeral=True)
+VERIFY_CUSTOM_ID_PREFIX = "hoshikuzu:verify:"
+LEGACY_VERIFY_CUSTOM_ID = "verify_button"  # anciens messages : la cible est lue dans le pied de l'embed
 
-@bot.event
-async def on_member_join(member: discord.Member):
-    """Système d'accueil et de vérification automatique"""
-    guild_id = str(member.guild.id)
+def verify_button_view(target: Union[int, str]) -> discord.ui.View:
+    """Bouton de vérification sans état : la cible (ID du membre ou "group") est encodée dans le custom_id"""
+    view = discord.ui.View(timeout=None)
+    view.add_item(discord.ui.Button(
+        label="✅ Me vérifier",
+        style=discord.ButtonStyle.success,
+        custom_id=f"{VERIFY_CUSTOM_ID_PREFIX}{target}"
+    ))
+    # Vue arrêtée : elle n'est pas conservée en mémoire, les clics passent par on_interaction
+    view.stop()
+    return view
+
+def verify_click_allowed(interaction: discord.Interaction, custom_id: str) -> Tuple[bool, bool]:
+    """Retourne (autorisé, message groupé) pour un clic sur un bouton de vérification"""
+    message = interaction.message
+    user_id = interaction.user.id
+    
+    if custom_id == LEGACY_VERIFY_CUSTOM_ID:
+        footer = message.embeds[0].footer.text if message and message.embeds else None
+        target = footer[len("ID: "):] if footer and footer.startswith("ID: ") else ""
+        return target == str(user_id), False
     
+    target = custom_id[len(VERIFY_CUSTOM_ID_PREFIX):]
+    if target == "group":
+        # Message groupé : les membres concernés sont mentionnés dans le contenu
+        return message is not None and user_id in message.raw_mentions, True
+    return target == str(user_id), False
+
+async def handle_verify_click(interaction: discord.Interaction, custom_id: str):
+    """Vérifie le membre qui a cliqué sur un bouton de vérification"""
+    allowed, group = verify_click_allowed(interaction, custom_id)
+    if not allowed:
+        return await interaction.response.send_message("❌ Ce bouton n'est pas pour toi !", ephemeral=True)
+    
+    guild_id = str(interaction.guild.id)
     if guild_id not in verification_config:
-        return
+        return await interaction.response.send_message("❌ Configuration manquante !", ephemeral=True)
     
     config = verification_config[guild_id]
+    member = interaction.user
     
-    # Ajoute le rôle non vérifié
+    try:
+        # Retire le rôle non vérifié et ajoute les rôles vérifiés en un seul appel
+        unverified_role = interaction.guild.get_role(config.get("unverified_role_id"))
+        verified_roles = []
+        for role_id in config.get("verified_role_ids", []):
+            role = interaction.guild.get_role(role_id)
+            if role:
+                verified_roles.append(role)
+        
+        await apply_role_diff(
+            member,
+            add=verified_roles,
+            remove=[unverified_role] if unverified_role else [],
+            reason="Vérification du membre"
+        )
+        
+        roles_names = ", ".join([r.name for r in verified_roles])
+        await interaction.response.send_message(
+            f"✅ **Vérification réussie !**\nTu as reçu les rôles: {roles_names}\nBienvenue sur le serveur ! 🎉",
+            ephemeral=True
+        )
+        
+        # Le message groupé reste en place pour les autres membres
+        if group:
+            return
+        
+        # Édite le message original
+        verified_embed = discord.Embed(
+            title="✅ Membre vérifié !",
+            description=f"{member.mention} s'est vérifié avec succès !",
+            color=discord.Color.green()
+        )
+        verified_embed.set_thumbnail(url=member.display_avatar.url)
+        verified_embed.set_footer(text=f"ID: {member.id}")
+        verified_embed.timestamp = datetime.datetime.now()
+        
+        await interaction.message.edit(embed=verified_embed, view=None)
+        
+    except Exception as e:
+        print(f"Erreur vérification: {e}")
+        if not interaction.response.is_done():
+            await interaction.response.send_message("❌ Erreur lors de la vérification.", ephemeral=True)
+
+@bot.event
+@instrumented_event
+async def on_interaction(interaction: discord.Interaction):
+    """Aiguille les clics sur les boutons de vérification (un seul gestionnaire, redémarrage sans perte)"""
+    if interaction.type != discord.InteractionType.component or interaction.guild is None:
+        return
+    custom_id = (interaction.data or {}).get("custom_id", "")
+    if custom_id == LEGACY_VERIFY_CUSTOM_ID or custom_id.startswith(VERIFY_CUSTOM_ID_PREFIX):
+        await handle_verify_click(interaction, custom_id)
+
+async def assign_unverified_role(member: discord.Member, config: Dict[str, Any]) -> bool:
+    """Ajoute le rôle non vérifié à un nouveau membre"""
     unverified_role = member.guild.get_role(config.get("unverified_role_id"))
-    if unverified_role:
-        try:
-            await member.add_roles(unverified_role)
-            print(f"✅ Rôle '{unverified_role.name}' attribué à {member.name}")
-        except Exception as e:
-            print(f"Erreur attribution rôle: {e}")
-    
-    # Envoie le message de bienvenue dans le salon de vérification
+    if not unverified_role:
+        return False
+    try:
+        await add_member_roles(member, unverified_role)
+        print(f"✅ Rôle '{unverified_role.name}' attribué à {member.name}")
+        return True
+    except Exception as e:
+        print(f"Erreur attribution rôle: {e}")
+        return False
+
+async def send_welcome_message(member: discord.Member, config: Dict[str, Any]):
+    """Envoie le message de bienvenue individuel dans le salon de vérification"""
     verification_channel = member.guild.get_channel(config.get("verification_channel_id"))
-    if verification_channel:
+    if not verification_channel:
+        return
+    
+    welcome_embed = discord.Embed(
+        title="🎉 Bienvenue sur le serveur !",
+        description=(
+            f"Salut {member.mention} !\n\n"
+            "Pour accéder au serveur, tu dois te vérifier en cliquant sur le bouton ci-dessous.\n\n"
+            "Une fois vérifié, tu auras accès à tous les salons ! 🚀"
+        ),
+        color=discord.Color.blue()
+    )
+    welcome_embed.set_thumbnail(url=member.display_avatar.url)
+    welcome_embed.set_footer(text=f"ID: {member.id}")
+    welcome_embed.timestamp = datetime.datetime.now()
+    
+    try:
+        await verification_channel.send(
+            content=f"{member.mention}",
+            embed=welcome_embed,
+            view=verify_button_view(member.id)
+        )
+    except Exception as e:
+        print(f"Erreur envoi message bienvenue: {e}")
+
+class JoinPipeline:
+    """Arrivées d'un serveur : accueil individuel en temps normal, groupé pendant un raid"""
+    def __init__(self, guild: discord.Guild):
+        self.guild = guild
+        self._joins: deque = deque()
+        self._pending: List[discord.Member] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.burst = False
+        self.stats = {"joins": 0, "batched": 0, "batch_messages": 0}
+        self.tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record_join(self) -> bool:
+        """Enregistre une arrivée et retourne True si le serveur subit une vague d'arrivées"""
+        now = time.monotonic()
+        self.stats["joins"] += 1
+        self._joins.append(now)
+        while self._joins and self._joins[0] <= now - JOIN_BURST_WINDOW:
+            self._joins.popleft()
+        
+        burst = len(self._joins) >= JOIN_BURST_THRESHOLD
+        if burst != self.burst:
+            self.burst = burst
+            if burst:
+                print(f"[JOIN] 🚨 Vague d'arrivées sur {self.guild.name} : accueil groupé activé")
+            else:
+                print(f"[JOIN] ✅ Arrivées normales sur {self.guild.name} : accueil individuel rétabli")
+        return burst
+
+    def enqueue(self, member: discord.Member):
+        self._pending.append(member)
+        self.stats["batched"] += 1
+        if len(self._pending) >= JOIN_BATCH_SIZE:
+            self._schedule_flush(0)
+        elif self._flush_handle is None:
+            self._schedule_flush(JOIN_BATCH_INTERVAL)
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        # Référence gardée jusqu'à la fin : une tâche sans référence peut être ramassée en cours de route
+        task = asyncio.create_task(self.flush())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def flush(self):
+        self._flush_handle = None
+        batch, self._pending = self._pending[:JOIN_BATCH_SIZE], self._pending[JOIN_BATCH_SIZE:]
+        if self._pending:
+            self._schedule_flush(JOIN_BATCH_INTERVAL)
+        
+        # Ignore les membres déjà repartis (ou bannis) avant le traitement
+        batch = [member for member in batch if self.guild.get_member(member.id)]
+        guild_id = str(self.guild.id)
+        if not batch or guild_id not in verification_config:
+            return
+        config = verification_config[guild_id]
+        
+        async def assign(member: discord.Member) -> bool:
+            await get_member_edit_limiter(self.guild.id).acquire()
+            return await assign_unverified_role(member, config)
+        
+        await run_bounded(batch, assign, concurrency=4)
+        await self._send_batch_welcome(batch, config)
+
+    async def _send_batch_welcome(self, batch: List[discord.Member], config: Dict[str, Any]):
+        verification_channel = self.guild.get_channel(config.get("verification_channel_id"))
+        if not verification_channel:
+            return
+        
         welcome_embed = discord.Embed(
-            title="🎉 Bienvenue sur le serveur !",
+            title=f"🎉 Bienvenue aux {len(batch)} nouveaux membres !",
             description=(
-                f"Salut {member.mention} !\n\n"
-                "Pour accéder au serveur, tu dois te vérifier en cliquant sur le bouton ci-dessous.\n\n"
+                "\n".join(f"• {member.mention}" for member in batch) + "\n\n"
+                "Pour accéder au serveur, clique sur le bouton ci-dessous pour te vérifier.\n\n"
                 "Une fois vérifié, tu auras accès à tous les salons ! 🚀"
             ),
             color=discord.Color.blue()
         )
-        welcome_embed.set_thumbnail(url=member.display_avatar.url)
-        welcome_embed.set_footer(text=f"ID: {member.id}")
+        welcome_embed.set_footer(text="Accueil groupé (vague d'arrivées)")
         welcome_embed.timestamp = datetime.datetime.now()
         
-        view = VerifyButton(member.id)
-        
         try:
             await verification_channel.send(
-                content=f"{member.mention}",
+                content=" ".join(member.mention for member in batch),
                 embed=welcome_embed,
-                view=view
+                view=verify_button_view("group")
             )
+            self.stats["batch_messages"] += 1
         except Exception as e:
-            print(f"Erreur envoi message bienvenue: {e}")
+            print(f"Erreur envoi message bienvenue groupé: {e}")
 
-# -------------------- Système de statut --------------------
-async def check_and_apply_status_role(member: discord.Member) -> bool:
-    """Vérifie et applique le rôle de statut pour un membre"""
-    if member.bot:
-        return False
+join_pipelines: Dict[int, JoinPipeline] = {}
+
+def get_join_pipeline(guild: discord.Guild) -> JoinPipeline:
+    pipeline = join_pipelines.get(guild.id)
+    if pipeline is None:
+        pipeline = join_pipelines[guild.id] = JoinPipeline(guild)
+    return pipeline
+
+@bot.event
+@instrumented_event
+async def on_member_join(member: discord.Member):
+    """Système d'accueil et de vérification automatique"""
+    index = member_name_indexes.get(member.guild.id)
+    if index:
+        index.add(member)
     
     guild_id = str(member.guild.id)
-    if guild_id not in status_config:
-        return False
     
-    custom_status = None
+    if guild_id not in verification_config:
+        return
+    
+    config = verification_config[guild_id]
+    
+    # Pendant une vague d'arrivées, rôles et messages d'accueil sont traités par lots
+    pipeline = get_join_pipeline(member.guild)
+    if pipeline.record_join():
+        pipeline.enqueue(member)
+        return
+    
+    # Ajoute le rôle non vérifié
+    await assign_unverified_role(member, config)
+    
+    # Envoie le message de bienvenue dans le salon de vérification
+    await send_welcome_message(member, config)
+
+# -------------------- Système de statut --------------------
+class StatusMatcher:
+    """Règles de statut d'un serveur compilées en un seul automate"""
+    _versions = itertools.count(1)
+
+    def __init__(self, rules: Dict[str, Dict[str, Any]]):
+        self.version = next(self._versions)
+        self.rules = {key: (config["role_id"], config["original_text"]) for key, config in rules.items()}
+        self.role_ids = frozenset(role_id for role_id, _ in self.rules.values())
+        self.role_texts = {role_id: text for role_id, text in self.rules.values()}
+        self._automaton = AhoCorasick(self.rules)
+        # Une clé vide est contenue dans n'importe quel statut
+        self._always = {key for key in self.rules if not key}
+
+    def match(self, custom_status: Optional[str]) -> Set[str]:
+        """Retourne les clés de statut contenues dans le statut personnalisé"""
+        if not custom_status:
+            return set()
+        return self._automaton.findall(custom_status.lower()) | self._always
+
+    def target_roles(self, custom_status: Optional[str]) -> Dict[int, str]:
+        """Retourne {role_id: texte original} des rôles que le statut doit donner"""
+        targets = {}
+        for key in self.match(custom_status):
+            role_id, original_text = self.rules[key]
+            targets.setdefault(role_id, original_text)
+        return targets
+
+status_matchers: Dict[str, StatusMatcher] = {}
+
+def get_status_matcher(guild_id: str) -> Optional[StatusMatcher]:
+    """Retourne l'automate du serveur, compilé à la première utilisation"""
+    matcher = status_matchers.get(guild_id)
+    if matcher is None and status_config.get(guild_id):
+        matcher = status_matchers[guild_id] = StatusMatcher(status_config[guild_id])
+    return matcher
+
+def invalidate_status_matcher(guild_id: str):
+    """À appeler après toute modification de status_config[guild_id]"""
+    status_matchers.pop(guild_id, None)
+
+def get_custom_status(member: discord.Member) -> Optional[str]:
+    """Retourne le texte du statut personnalisé d'un membre"""
     for activity in member.activities:
         if isinstance(activity, discord.CustomActivity):
-            custom_status = activity.name
-            break
+            return activity.name
+    return None
+
+def plan_status_roles(member: discord.Member) -> Tuple[List[discord.Role], List[discord.Role], str]:
+    """Calcule (rôles à ajouter, rôles à retirer, raison) sans aucun appel REST"""
+    if member.bot:
+        return [], [], ""
     
-    if not custom_status:
-        for config in status_config[guild_id].values():
-            role = member.guild.get_role(config["role_id"])
-            if role and role in member.roles:
-                try:
-                    await member.remove_roles(role, reason="Statut personnalisé retiré")
-                except:
-                    pass
-        return False
+    matcher = get_status_matcher(str(member.guild.id))
+    if matcher is None:
+        return [], [], ""
     
-    custom_status_lower = custom_status.lower()
-    applied = False
+    custom_status = get_custom_status(member)
+    targets = matcher.target_roles(custom_status)
+    to_add, to_remove, reasons = [], [], []
     
-    for status_text, config in status_config[guild_id].items():
-        role = member.guild.get_role(config["role_id"])
+    for role in member.roles:
+        if role.id in matcher.role_ids and role.id not in targets:
+            to_remove.append(role)
+            if custom_status:
+                reasons.append(f"Statut ne contient plus: {matcher.role_texts[role.id]}")
+            else:
+                reasons.append("Statut personnalisé retiré")
+    
+    member_role_ids = {role.id for role in member.roles}
+    for role_id, original_text in targets.items():
+        if role_id in member_role_ids:
+            continue
+        role = member.guild.get_role(role_id)
         if not role:
             continue
-        
-        if status_text in custom_status_lower:
-            if role not in member.roles:
-                try:
-                    await member.add_roles(role, reason=f"Statut contient: {config['original_text']}")
-                    applied = True
-                except:
-                    pass
+        to_add.append(role)
+        reasons.append(f"Statut contient: {original_text}")
+    
+    return to_add, to_remove, " | ".join(dict.fromkeys(reasons))
+
+async def check_and_apply_status_role(member: discord.Member) -> bool:
+    """Vérifie et applique le rôle de statut pour un membre (les erreurs REST sont propagées à l'appelant)"""
+    with trace_span("planification rôles de statut"):
+        to_add, to_remove, reason = plan_status_roles(member)
+    if not to_add and not to_remove:
+        return False
+    
+    # Replanifié dans le verrou : une autre écriture a pu changer ses rôles entre-temps
+    return await apply_role_diff(member, plan=plan_status_roles) and bool(to_add)
+
+status_sweep_job: Optional[BackgroundJob] = None
+
+async def sweep_member_status(member: discord.Member) -> bool:
+    """Réconcilie un membre pendant la synchronisation de démarrage"""
+    to_add, to_remove, _ = plan_status_roles(member)
+    if not to_add and not to_remove:
+        return False
+    await get_member_edit_limiter(member.guild.id).acquire()
+    return await check_and_apply_status_role(member)
+
+def start_status_sweep() -> Optional[BackgroundJob]:
+    """Lance une seule fois par processus la synchronisation des rôles de statut"""
+    global status_sweep_job
+    if status_sweep_job is not None:
+        return None
+    
+    guilds = [guild for guild in bot.guilds if str(guild.id) in status_config]
+    for guild in guilds:
+        print(f"[STATUS] 🔍 Vérification des statuts pour {guild.name}...")
+    
+    async def report(job: BackgroundJob):
+        state = "terminée" if job.finished else "en cours"
+        print(f"[STATUS] 🔄 Synchronisation {state} : {job.progress_text()} membres, {job.succeeded} rôle(s) appliqué(s)")
+    
+    status_sweep_job = BackgroundJob("status-sweep", concurrency=STATUS_SWEEP_WORKERS, reporter=report)
+    status_sweep_job.total = sum(len(guild.members) for guild in guilds)
+    status_sweep_job.start((member for guild in guilds for member in guild.members), sweep_member_status)
+    return status_sweep_job
+
+# -------------------- Chargement des membres --------------------
+startup_stats: Dict[str, float] = {}
+member_chunk_tasks: Dict[int, asyncio.Task] = {}
+startup_chunking_task: Optional[asyncio.Task] = None
+
+def resident_memory() -> Optional[int]:
+    """Mémoire résidente du processus en octets (pic si /proc n'est pas disponible)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def memory_report() -> Dict[str, Any]:
+    """Mémoire résidente rapportée au nombre de membres en cache"""
+    rss = resident_memory()
+    members = sum(len(guild.members) for guild in bot.guilds)
+    report = {
+        "rss_mib": round(rss / 1048576, 1) if rss else None,
+        "cached_members": members,
+        "chunked_guilds": sum(1 for guild in bot.guilds if guild.chunked),
+        "guilds": len(bot.guilds),
+        "rss_mib_per_10k_members": None,
+    }
+    if rss and members:
+        # Part de la mémoire prise depuis le démarrage (caches gateway), rapportée à 10k membres
+        used = rss - startup_stats.get("baseline_rss", 0)
+        report["rss_mib_per_10k_members"] = round(used / 1048576 / members * 10000, 2)
+    return report
+
+async def chunk_guild(guild: discord.Guild):
+    """Charge la liste complète des membres d'un serveur"""
+    start = time.perf_counter()
+    try:
+        await guild.chunk(cache=True)
+    except Exception as e:
+        print(f"[ERREUR] Chargement des membres de {guild.name}: {e}")
+        return
+    finally:
+        member_chunk_tasks.pop(guild.id, None)
+    # L'index des noms a pu être construit sur une liste partielle
+    member_name_indexes.pop(guild.id, None)
+    print(f"[CHUNK] 👥 {guild.name} : {len(guild.members)} membres chargés en {time.perf_counter() - start:.1f}s")
+
+async def ensure_chunked(guild: discord.Guild):
+    """Charge les membres d'un serveur à la première utilisation (demandes simultanées fusionnées)"""
+    if guild.chunked:
+        return
+    task = member_chunk_tasks.get(guild.id)
+    if task is None:
+        task = member_chunk_tasks[guild.id] = asyncio.create_task(chunk_guild(guild))
+    with trace_span("chargement des membres"):
+        await asyncio.shield(task)
+
+async def chunk_status_guilds():
+    """Démarrage : charge les membres des serveurs à rôles de statut, puis synchronise leurs rôles"""
+    guilds = [guild for guild in bot.guilds if str(guild.id) in status_config and not guild.chunked]
+    if guilds:
+        print(f"[CHUNK] ⏳ Chargement des membres de {len(guilds)} serveur(s) à rôles de statut...")
+    await run_bounded(guilds, ensure_chunked, concurrency=CHUNK_WORKERS)
+    
+    startup_stats["members_ready"] = time.monotonic() - PROCESS_STARTED
+    memory = memory_report()
+    print(
+        f"[BOT] ⏱️ Membres prêts en {startup_stats['members_ready']:.1f}s : "
+        f"{memory['cached_members']} en cache sur {memory['chunked_guilds']}/{memory['guilds']} serveur(s) chargé(s), "
+        f"{memory['rss_mib']} Mio résidents ({memory['rss_mib_per_10k_members']} Mio / 10k membres)"
+    )
+    start_status_sweep()
+
+def start_startup_chunking():
+    """Lance une seule fois par processus le chargement sélectif des membres"""
+    global startup_chunking_task
+    if startup_chunking_task is None:
+        startup_chunking_task = asyncio.create_task(chunk_status_guilds())
+
+status_backfill_jobs: Dict[Tuple[int, str], BackgroundJob] = {}
+
+def start_status_backfill(guild: discord.Guild, role: discord.Role, status_key: str,
+                          original_text: str, progress_message: discord.Message,
+                          previous_role_id: Optional[int] = None) -> BackgroundJob:
+    """Applique une nouvelle règle de statut aux membres existants, en arrière-plan"""
+    job_key = (guild.id, status_key)
+    previous = status_backfill_jobs.get(job_key)
+    if previous:
+        previous.cancel()
+    
+    def plan(member: discord.Member) -> Tuple[List[discord.Role], List[discord.Role], str]:
+        """Seule la règle ajoutée est évaluée : les rôles des autres règles ne sont pas touchés"""
+        custom_status = get_custom_status(member)
+        if member.bot or not custom_status or status_key not in custom_status.lower():
+            return [], [], ""
+        to_add = [] if member.get_role(role.id) else [role]
+        to_remove = []
+        # La règle a changé de rôle : l'ancien est retiré, sauf si une autre règle le donne encore
+        old_role = member.get_role(previous_role_id) if previous_role_id is not None else None
+        if old_role is not None:
+            matcher = get_status_matcher(str(guild.id))
+            if matcher is None or old_role.id not in matcher.target_roles(custom_status):
+                to_remove.append(old_role)
+        return to_add, to_remove, f"Statut contient: {original_text}"
+    
+    async def apply(member: discord.Member) -> bool:
+        # Le parcours des membres se fait ici, dans le job (qui rend la main tous les 100 membres)
+        to_add, to_remove, _ = plan(member)
+        if not to_add and not to_remove:
+            return False
+        await get_member_edit_limiter(guild.id).acquire()
+        return await apply_role_diff(member, plan=plan)
+    
+    async def report(job: BackgroundJob):
+        if job.cancelled:
+            text = f"🛑 Application annulée : rôle appliqué à {job.succeeded} membre(s) sur {job.done} traité(s)."
+        elif job.finished:
+            text = f"✅ Rôle appliqué à {job.succeeded} membre(s) existant(s) !"
+            if job.failed:
+                text += f" ({job.failed} échec(s))"
         else:
-            if role in member.roles:
-                try:
-                    await member.remove_roles(role, reason=f"Statut ne contient plus: {config['original_text']}")
-                except:
-                    pass
+            text = f"⏳ Application de {role.mention} : {job.progress_text()}"
+        await progress_message.edit(content=text)
+        if job.finished and status_backfill_jobs.get(job_key) is job:
+            del status_backfill_jobs[job_key]
     
-    return applied
+    job = BackgroundJob(f"status-backfill-{guild.id}", concurrency=4, report_every=5.0, reporter=report)
+    status_backfill_jobs[job_key] = job
+    job.start(list(guild.members), apply)
+    return job
+
+def cancel_status_backfills(guild_id: int, status_key: Optional[str] = None) -> int:
+    """Annule les applications en cours d'un serveur (ou d'une seule règle)"""
+    cancelled = 0
+    for (job_guild_id, job_status_key), job in list(status_backfill_jobs.items()):
+        if job_guild_id == guild_id and status_key in (None, job_status_key) and job.cancel():
+            cancelled += 1
+    return cancelled
+
+class PresenceCoalescer:
+    """Regroupe les mises à jour de présence d'un membre et ignore celles sans effet"""
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: Dict[Tuple[int, int], discord.Member] = {}
+        # (guild_id, member_id) -> (version de l'automate, clés de statut trouvées)
+        self._last_matched: Dict[Tuple[int, int], Tuple[int, frozenset]] = {}
+        self.stats = {"received": 0, "coalesced": 0, "dropped_noop": 0, "processed": 0}
+        self.tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def submit(self, member: discord.Member):
+        """Planifie le traitement ; seul le dernier état reçu pendant la fenêtre est traité"""
+        key = (member.guild.id, member.id)
+        self.stats["received"] += 1
+        if key in self._pending:
+            self.stats["coalesced"] += 1
+            self._pending[key] = member
+            return
+        self._pending[key] = member
+        asyncio.get_running_loop().call_later(self.window, self._flush, key)
+
+    def forget(self, guild_id: int, member_id: int):
+        self._pending.pop((guild_id, member_id), None)
+        self._last_matched.pop((guild_id, member_id), None)
+
+    def _flush(self, key: Tuple[int, int]):
+        member = self._pending.pop(key, None)
+        if member is not None:
+            task = asyncio.create_task(self._process(key, member))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _process(self, key: Tuple[int, int], member: discord.Member):
+        matcher = get_status_matcher(str(member.guild.id))
+        if matcher is None:
+            self.stats["dropped_noop"] += 1
+            return
+        
+        state = (matcher.version, frozenset(matcher.match(get_custom_status(member))))
+        if self._last_matched.get(key) == state:
+            self.stats["dropped_noop"] += 1
+            return
+        
+        self._last_matched[key] = state
+        self.stats["processed"] += 1
+        try:
+            await check_and_apply_status_role(member)
+        except Exception as e:
+            # Échec (429, permissions...) : la prochaine présence identique doit retenter
+            if self._last_matched.get(key) == state:
+                del self._last_matched[key]
+            print(f"[STATUS] Erreur mise à jour statut {member}: {e}")
+
+presence_coalescer = PresenceCoalescer(PRESENCE_COALESCE_WINDOW)
 
 @bot.event
+@instrumented_event
 async def on_presence_update(before: discord.Member, after: discord.Member):
     """Détecte les changements de statut"""
-    before_status = None
-    after_status = None
+    if str(after.guild.id) not in status_config:
+        return
+    if get_custom_status(before) != get_custom_status(after):
+        presence_coalescer.submit(after)
+
+# -------------------- Provisionnement de la vérification --------------------
+VERIFICATION_CHANNEL_NAME = "✅・vérification"
+
+class ProvisioningPlan:
+    """Différence entre ROLES_TO_CREATE / salon de vérification et l'état actuel du serveur"""
+    def __init__(self, guild: discord.Guild):
+        # Index des noms construit une seule fois (au lieu d'un parcours par rôle)
+        role_names = {role.name for role in guild.roles}
+        self.roles_to_create = [data for data in ROLES_TO_CREATE if data["name"] not in role_names]
+        self.roles_existing = [data["name"] for data in ROLES_TO_CREATE if data["name"] in role_names]
+        
+        self.channel: Optional[discord.TextChannel] = None
+        config = verification_config.get(str(guild.id))
+        if config and config.get("verification_channel_id"):
+            channel = guild.get_channel(config["verification_channel_id"])
+            if isinstance(channel, discord.TextChannel):
+                self.channel = channel
+        if self.channel is None:
+            channels = {channel.name: channel for channel in guild.text_channels}
+            self.channel = channels.get(VERIFICATION_CHANNEL_NAME)
+
+    @property
+    def create_channel(self) -> bool:
+        return self.channel is None
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.roles_to_create and not self.create_channel
+
+    def preview_embed(self) -> discord.Embed:
+        embed = discord.Embed(title="🔍 Aperçu de la configuration", color=discord.Color.blue())
+        to_create = ", ".join(data["name"] for data in self.roles_to_create) or "Aucun"
+        embed.add_field(name=f"📊 Rôles à créer ({len(self.roles_to_create)})", value=to_create[:1024], inline=False)
+        embed.add_field(name="📋 Rôles existants", value=f"{len(self.roles_existing)} rôles", inline=True)
+        embed.add_field(
+            name="📢 Salon de vérification",
+            value=f"À créer : {VERIFICATION_CHANNEL_NAME}" if self.create_channel else f"Existant : {self.channel.mention}",
+            inline=True
+        )
+        embed.set_footer(text="Aucune modification effectuée. Lance +setupverification pour appliquer.")
+        return embed
+
+async def execute_provisioning(guild: discord.Guild, plan: ProvisioningPlan, progress_message: discord.Message) -> List[str]:
+    """Crée les rôles manquants en parallèle borné sous le limiteur de création ; retourne les noms créés"""
+    created: List[str] = []
+    if not plan.roles_to_create:
+        return created
     
-    for activity in before.activities:
-        if isinstance(activity, discord.CustomActivity):
-            before_status = activity.name
-            break
+    limiter = RateLimiter(ROLE_CREATE_RATE, ROLE_CREATE_PER)
     
-    for activity in after.activities:
-        if isinstance(activity, discord.CustomActivity):
-            after_status = activity.name
-            break
+    async def create(role_data: Dict[str, Any]) -> bool:
+        await limiter.acquire()
+        try:
+            await guild.create_role(
+                name=role_data["name"],
+                color=discord.Color(role_data["color"]),
+                mentionable=False
+            )
+        except Exception as e:
+            print(f"Erreur création rôle {role_data['name']}: {e}")
+            return False
+        created.append(role_data["name"])
+        return True
+    
+    async def report(job: BackgroundJob):
+        if not job.finished:
+            await progress_message.edit(content=f"🔧 Création des rôles : {job.progress_text()}")
     
-    if before_status != after_status:
-        await check_and_apply_status_role(after)
+    job = BackgroundJob(f"provisioning-{guild.id}", concurrency=ROLE_CREATE_WORKERS, report_every=3.0, reporter=report)
+    await job.start(plan.roles_to_create, create)
+    return created
 
 # -------------------- Commandes de configuration --------------------
 @bot.command(name="setupverification")
 @commands.has_permissions(administrator=True)
-async def setup_verification(ctx: commands.Context):
+async def setup_verification(ctx: commands.Context, mode: str = None):
     """Configure le système de vérification complet"""
-    await ctx.send("🔧 Configuration en cours... Création des rôles et du salon de vérification.")
-    
     guild = ctx.guild
-    stats = {"roles_created": [], "roles_existing": [], "channels_created": []}
+    plan = ProvisioningPlan(guild)
     
-    # Crée tous les rôles
-    for role_data in ROLES_TO_CREATE:
-        existing_role = discord.utils.get(guild.roles, name=role_data["name"])
-        if existing_role:
-            stats["roles_existing"].append(role_data["name"])
-        else:
-            try:
-                await guild.create_role(
-                    name=role_data["name"],
-                    color=discord.Color(role_data["color"]),
-                    mentionable=False
-                )
-                stats["roles_created"].append(role_data["name"])
-            except Exception as e:
-                print(f"Erreur création rôle {role_data['name']}: {e}")
+    if mode and mode.lower() in ("preview", "dryrun", "apercu", "aperçu"):
+        return await ctx.send(embed=plan.preview_embed())
     
-    # Crée le salon de vérification
-    try:
-        verification_channel = await guild.create_text_channel(
-            name="✅・vérification",
-            overwrites={
-                guild.default_role: discord.PermissionOverwrite(
-                    send_messages=False,
-                    view_channel=True,
-                    read_message_history=True
-                )
-            }
-        )
-        stats["channels_created"].append("✅・vérification")
-        
-        info_embed = discord.Embed(
-            title="📋 Salon de Vérification",
-            description="Les nouveaux membres apparaîtront ici avec un bouton de vérification.",
-            color=discord.Color.blue()
-        )
-        info_embed.timestamp = datetime.datetime.now()
-        await verification_channel.send(embed=info_embed)
-        
-    except Exception as e:
-        print(f"Erreur création salon: {e}")
-        return await ctx.send("❌ Erreur lors de la création du salon de vérification.")
+    if plan.is_empty:
+        guild_id = str(guild.id)
+        if verification_config.get(guild_id, {}).get("verification_channel_id") != plan.channel.id:
+            verification_config.setdefault(guild_id, {"unverified_role_id": None, "verified_role_ids": []})
+            verification_config[guild_id]["verification_channel_id"] = plan.channel.id
+            save_config(verification_config, guild_id)
+        return await ctx.send(embed=embed_action(
+            discord.Color.green(),
+            "Déjà configuré",
+            f"✅ Les {len(plan.roles_existing)} rôles et le salon {plan.channel.mention} existent déjà. Rien à créer."
+        ))
+    
+    progress_message = await ctx.send("🔧 Configuration en cours... Création des rôles et du salon de vérification.")
+    stats = {"roles_created": [], "roles_existing": plan.roles_existing, "channels_created": []}
+    
+    # Crée uniquement les rôles manquants
+    stats["roles_created"] = await execute_provisioning(guild, plan, progress_message)
+    
+    # Crée le salon de vérification s'il n'existe pas encore
+    verification_channel = plan.channel
+    if plan.create_channel:
+        try:
+            verification_channel = await guild.create_text_channel(
+                name=VERIFICATION_CHANNEL_NAME,
+                overwrites={
+                    guild.default_role: discord.PermissionOverwrite(
+                        send_messages=False,
+                        view_channel=True,
+                        read_message_history=True
+                    )
+                }
+            )
+            stats["channels_created"].append(VERIFICATION_CHANNEL_NAME)
+            
+            info_embed = discord.Embed(
+                title="📋 Salon de Vérification",
+                description="Les nouveaux membres apparaîtront ici avec un bouton de vérification.",
+                color=discord.Color.blue()
+            )
+            info_embed.timestamp = datetime.datetime.now()
+            await verification_channel.send(embed=info_embed)
+            
+        except Exception as e:
+            print(f"Erreur création salon: {e}")
+            return await ctx.send("❌ Erreur lors de la création du salon de vérification.")
     
     # Affiche les statistiques
     stats_embed = discord.Embed(
@@ -406,8 +2531,16 @@ async def setup_verification(ctx: commands.Context):
     )
     stats_embed.add_field(name="📊 Rôles créés", value=f"{len(stats['roles_created'])} rôles", inline=True)
     stats_embed.add_field(name="📋 Rôles existants", value=f"{len(stats['roles_existing'])} rôles", inline=True)
-    stats_embed.add_field(name="📢 Salons créés", value="\n".join(stats["channels_created"]), inline=False)
+    stats_embed.add_field(
+        name="📢 Salons créés",
+        value="\n".join(stats["channels_created"]) or f"Aucun ({verification_channel.mention} existe déjà)",
+        inline=False
+    )
+    failed = len(plan.roles_to_create) - len(stats["roles_created"])
+    if failed:
+        stats_embed.add_field(name="⚠️ Échecs", value=f"{failed} rôle(s) non créé(s)", inline=False)
     
+    await progress_message.edit(content="✅ Configuration terminée.")
     await ctx.send(embed=stats_embed)
     
     # Configuration interactive
@@ -423,14 +2556,11 @@ async def setup_verification(ctx: commands.Context):
     )
     await ctx.send(embed=config_embed)
     
-    # Initialise la config
+    # Initialise la config (sans écraser les rôles déjà configurés)
     guild_id = str(guild.id)
-    verification_config[guild_id] = {
-        "verification_channel_id": verification_channel.id,
-        "unverified_role_id": None,
-        "verified_role_ids": []
-    }
-    save_config(verification_config, VERIFICATION_CONFIG_FILE)
+    verification_config.setdefault(guild_id, {"unverified_role_id": None, "verified_role_ids": []})
+    verification_config[guild_id]["verification_channel_id"] = verification_channel.id
+    save_config(verification_config, guild_id)
 
 @bot.command(name="configverif")
 @commands.has_permissions(administrator=True)
@@ -453,7 +2583,7 @@ async def config_verif(ctx: commands.Context, config_type: str = None, role: dis
     
     if config_type.lower() == "unverified":
         verification_config[guild_id]["unverified_role_id"] = role.id
-        save_config(verification_config, VERIFICATION_CONFIG_FILE)
+        save_config(verification_config, guild_id)
         await ctx.send(embed=embed_action(
             discord.Color.green(),
             "Rôle non vérifié défini",
@@ -463,7 +2593,7 @@ async def config_verif(ctx: commands.Context, config_type: str = None, role: dis
     elif config_type.lower() == "verified":
         if role.id not in verification_config[guild_id]["verified_role_ids"]:
             verification_config[guild_id]["verified_role_ids"].append(role.id)
-            save_config(verification_config, VERIFICATION_CONFIG_FILE)
+            save_config(verification_config, guild_id)
             await ctx.send(embed=embed_action(
                 discord.Color.green(),
                 "Rôle vérifié ajouté",
@@ -495,13 +2625,15 @@ async def setstatus_cmd(ctx: commands.Context, role: discord.Role = None, *, sta
         status_config[guild_id] = {}
     
     status_key = status_text.lower().strip()
+    previous_role_id = status_config[guild_id].get(status_key, {}).get("role_id")
     
     status_config[guild_id][status_key] = {
         "role_id": role.id,
         "role_name": role.name,
         "original_text": status_text
     }
-    save_config(status_config, STATUS_CONFIG_FILE)
+    invalidate_status_matcher(guild_id)
+    save_config(status_config, guild_id)
     
     embed = embed_action(
         discord.Color.purple(),
@@ -511,193 +2643,1801 @@ async def setstatus_cmd(ctx: commands.Context, role: discord.Role = None, *, sta
     )
     await ctx.send(embed=embed)
     
-    applied_count = 0
-    for member in ctx.guild.members:
-        if await check_and_apply_status_role(member):
-            applied_count += 1
+    # Applique la nouvelle règle aux membres existants sans bloquer la commande
+    progress_message = await ctx.send(f"⏳ Application de {role.mention} aux membres existants...")
+    start_status_backfill(ctx.guild, role, status_key, status_text, progress_message,
+                          previous_role_id if previous_role_id != role.id else None)
+
+@bot.command(name="removestatus")
+@commands.has_permissions(manage_roles=True)
+async def removestatus_cmd(ctx: commands.Context, *, status_text: str = None):
+    """Retire la configuration d'un statut"""
+    if not status_text:
+        return await ctx.send(embed=error_embed(
+            "Usage manquant",
+            "❌ Utilisation : `+removestatus <texte du statut>`"
+        ))
+    
+    guild_id = str(ctx.guild.id)
+    status_key = status_text.lower().strip()
+    
+    if guild_id not in status_config or status_key not in status_config[guild_id]:
+        return await ctx.send(embed=error_embed(
+            "Statut introuvable",
+            f"❌ Aucune configuration trouvée pour : **{status_text}**"
+        ))
+    
+    role_name = status_config[guild_id][status_key]["role_name"]
+    del status_config[guild_id][status_key]
+    cancel_status_backfills(ctx.guild.id, status_key)
+    
+    if not status_config[guild_id]:
+        del status_config[guild_id]
+    
+    invalidate_status_matcher(guild_id)
+    save_config(status_config, guild_id)
     
-    if applied_count > 0:
-        await ctx.send(f"✅ Rôle appliqué à {applied_count} membre(s) existant(s) !", delete_after=5)
+    await ctx.send(embed=embed_action(
+        discord.Color.green(),
+        "Configuration Retirée",
+        f"✅ La configuration pour **{status_text}** (rôle: {role_name}) a été supprimée."
+    ))
+
+@bot.command(name="cancelbackfill")
+@commands.has_permissions(manage_roles=True)
+async def cancelbackfill_cmd(ctx: commands.Context, *, status_text: str = None):
+    """Annule l'application en cours d'une règle de statut aux membres existants"""
+    status_key = status_text.lower().strip() if status_text else None
+    cancelled = cancel_status_backfills(ctx.guild.id, status_key)
+    if not cancelled:
+        return await ctx.send(embed=error_embed("Aucune application en cours", "❌ Rien à annuler."))
+    await ctx.send(embed=embed_action(
+        discord.Color.orange(),
+        "Application annulée",
+        f"🛑 {cancelled} application(s) de rôle de statut annulée(s)."
+    ))
+
+@bot.command(name="liststatus")
+async def liststatus_cmd(ctx: commands.Context):
+    """Liste tous les statuts configurés"""
+    guild_id = str(ctx.guild.id)
+    
+    if guild_id not in status_config or not status_config[guild_id]:
+        return await ctx.send(embed=error_embed(
+            "Aucune configuration",
+            "❌ Aucun statut n'est configuré.\n\nUtilise `+setstatus <@role> <texte>` pour en créer un."
+        ))
+    
+    embed = discord.Embed(title="🌟 Statuts Configurés", color=discord.Color.purple())
+    
+    for status_text, config in status_config[guild_id].items():
+        role = ctx.guild.get_role(config["role_id"])
+        role_mention = role.mention if role else f"~~{config['role_name']}~~ (rôle supprimé)"
+        embed.add_field(
+            name=f"📝 {config['original_text']}", 
+            value=f"→ {role_mention}",
+            inline=False
+        )
+    
+    embed.set_footer(text="Les membres avec ces textes dans leur statut recevront le rôle correspondant")
+    await ctx.send(embed=embed)
+
+# -------------------- Suppression de messages --------------------
+# Le bulk-delete refuse les messages de plus de 14 jours (marge d'une minute)
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=1)
+
+class PurgeFilter:
+    """Critères de sélection des messages pour +clear"""
+    def __init__(self):
+        self.author_ids: Set[int] = set()
+        self.bots = False
+        self.attachments = False
+        self.pattern: Optional[re.Pattern] = None
+        self.after: Optional[datetime.datetime] = None
+        self.before: Optional[datetime.datetime] = None
+
+    def matches(self, message: discord.Message) -> bool:
+        if self.author_ids and message.author.id not in self.author_ids:
+            return False
+        if self.bots and not message.author.bot:
+            return False
+        if self.attachments and not message.attachments:
+            return False
+        if self.pattern and not self.pattern.search(message.content):
+            return False
+        return True
+
+    def describe(self) -> str:
+        parts = []
+        if self.author_ids:
+            parts.append("auteurs : " + ", ".join(f"<@{author_id}>" for author_id in self.author_ids))
+        if self.bots:
+            parts.append("bots")
+        if self.attachments:
+            parts.append("pièces jointes")
+        if self.pattern:
+            parts.append(f"regex `{self.pattern.pattern}`")
+        if self.after:
+            parts.append(f"après {discord.utils.format_dt(self.after, 'R')}")
+        if self.before:
+            parts.append(f"avant {discord.utils.format_dt(self.before, 'R')}")
+        return ", ".join(parts) or "aucun filtre"
+
+def parse_purge_filter(text: Optional[str]) -> PurgeFilter:
+    """Analyse `user:@x bots attachments regex:"..." after:1h before:2d` ; lève ValueError si invalide"""
+    purge_filter = PurgeFilter()
+    now = discord.utils.utcnow()
+    for token in shlex.split(text or ""):
+        key, _, value = token.partition(":")
+        key = key.lower()
+        match = USER_ID_PATTERN.fullmatch(token) or (USER_ID_PATTERN.fullmatch(value) if key == "user" else None)
+        if match:
+            purge_filter.author_ids.add(int(match.group(1) or match.group(2)))
+        elif key in ("bots", "bot"):
+            purge_filter.bots = True
+        elif key in ("attachments", "fichiers", "images"):
+            purge_filter.attachments = True
+        elif key == "regex" and value:
+            try:
+                purge_filter.pattern = re.compile(value, re.IGNORECASE)
+            except re.error:
+                raise ValueError(f"Regex invalide : `{value}`")
+        elif key in ("after", "before") and value:
+            seconds = parse_duration(value)
+            if not seconds or seconds <= 0:
+                raise ValueError(f"Durée invalide : `{value}` (ex : 30m, 2h, 7d)")
+            setattr(purge_filter, key, now - datetime.timedelta(seconds=seconds))
+        else:
+            raise ValueError(f"Filtre inconnu : `{token}`")
+    return purge_filter
+
+class PurgeJob:
+    """Suppression en flux : parcours paresseux de l'historique, bulk-delete par 100, suppression unitaire au-delà de 14 jours"""
+    def __init__(self, channel: discord.TextChannel, limit: int, purge_filter: PurgeFilter, before: discord.abc.Snowflake):
+        self.channel = channel
+        self.limit = limit
+        self.filter = purge_filter
+        self.before = before
+        self.scanned = 0
+        self.deleted_bulk = 0
+        self.deleted_single = 0
+        self.started_at = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+        self.cancelled = False
+        self._single_limiter = RateLimiter(5, 5.0)
+
+    @property
+    def deleted(self) -> int:
+        return self.deleted_bulk + self.deleted_single
+
+    def progress_text(self) -> str:
+        elapsed = time.monotonic() - self.started_at
+        rate = self.deleted / elapsed if elapsed > 0 else 0.0
+        return (f"🧹 {self.deleted}/{self.limit} supprimé(s) ({self.deleted_single} ancien(s)), "
+                f"{self.scanned} parcouru(s), {rate:.1f}/s")
+
+    def cancel(self) -> bool:
+        if self.task is None or self.task.done():
+            return False
+        self.cancelled = True
+        self.task.cancel()
+        return True
+
+    async def _flush(self, chunk: List[discord.Message]):
+        if len(chunk) == 1:
+            await chunk[0].delete()
+        elif chunk:
+            await self.channel.delete_messages(chunk)
+        self.deleted_bulk += len(chunk)
+        chunk.clear()
+
+    async def run(self):
+        chunk: List[discord.Message] = []
+        matched = 0
+        # `before:` démarre la pagination au bon endroit au lieu de parcourir (et compter) les messages plus récents
+        start = self.before
+        if self.filter.before:
+            boundary = discord.Object(id=discord.utils.time_snowflake(self.filter.before))
+            if boundary.id < start.id:
+                start = boundary
+        try:
+            async for message in self.channel.history(limit=CLEAR_SCAN_MAX, before=start,
+                                                      after=self.filter.after, oldest_first=False):
+                self.scanned += 1
+                if not self.filter.matches(message):
+                    continue
+                
+                if discord.utils.utcnow() - message.created_at < BULK_DELETE_MAX_AGE:
+                    chunk.append(message)
+                    if len(chunk) == 100:
+                        await self._flush(chunk)
+                else:
+                    # L'historique est antéchronologique : tout ce qui suit est aussi trop ancien
+                    await self._flush(chunk)
+                    await self._single_limiter.acquire()
+                    try:
+                        await message.delete()
+                        self.deleted_single += 1
+                    except discord.NotFound:
+                        pass
+                
+                matched += 1
+                if matched >= self.limit:
+                    break
+        finally:
+            if chunk and not self.cancelled:
+                await self._flush(chunk)
+
+purge_jobs: Dict[int, PurgeJob] = {}
+
+# -------------------- Commandes de modération --------------------
+@bot.command(name="clear")
+@commands.has_permissions(manage_messages=True)
+async def clear_cmd(ctx: commands.Context, amount: Optional[int] = 5, *, filters: str = None):
+    """Supprime des messages"""
+    amount = 5 if amount is None else amount
+    if amount < 1 or amount > CLEAR_MAX:
+        return await ctx.send(embed=error_embed("Valeur invalide", f"Le nombre doit être entre 1 et {CLEAR_MAX}."))
+    try:
+        purge_filter = parse_purge_filter(filters)
+    except ValueError as e:
+        return await ctx.send(embed=error_embed("Filtre invalide", f"❌ {e}"))
+    
+    running = purge_jobs.get(ctx.channel.id)
+    if running and running.task and not running.task.done():
+        return await ctx.send(embed=error_embed("Suppression en cours", "❌ Utilise `+clearstop` pour l'annuler."))
+    
+    try:
+        await ctx.message.delete()
+    except discord.HTTPException:
+        pass
+    
+    job = PurgeJob(ctx.channel, amount, purge_filter, before=ctx.message)
+    purge_jobs[ctx.channel.id] = job
+    progress_message = None
+    if amount > 100 or filters:
+        progress_message = await ctx.send(f"🧹 Suppression en cours ({purge_filter.describe()})...")
+    
+    async def report_progress():
+        while True:
+            await asyncio.sleep(3)
+            if progress_message:
+                try:
+                    await progress_message.edit(content=job.progress_text())
+                except discord.HTTPException:
+                    pass
+    
+    reporter = asyncio.create_task(report_progress())
+    job.task = asyncio.create_task(job.run())
+    try:
+        await job.task
+    except asyncio.CancelledError:
+        if not job.cancelled:
+            raise
+    except discord.HTTPException as e:
+        print(f"[CLEAR] Erreur suppression: {e}")
+    finally:
+        reporter.cancel()
+        if purge_jobs.get(ctx.channel.id) is job:
+            del purge_jobs[ctx.channel.id]
+    
+    if progress_message:
+        try:
+            await progress_message.delete()
+        except discord.HTTPException:
+            pass
+    
+    title = "Clear annulé" if job.cancelled else "Clear"
+    await ctx.send(embed=embed_action(discord.Color.blue(), title, f"🧹 {job.deleted} messages supprimés."), delete_after=5)
+
+@bot.command(name="clearstop")
+@commands.has_permissions(manage_messages=True)
+async def clearstop_cmd(ctx: commands.Context):
+    """Annule le +clear en cours dans ce salon"""
+    job = purge_jobs.get(ctx.channel.id)
+    if not job or not job.cancel():
+        return await ctx.send(embed=error_embed("Aucun clear en cours", "❌ Rien à annuler dans ce salon."))
+
+@bot.command(name="kick")
+@commands.has_permissions(kick_members=True)
+async def kick_cmd(ctx: commands.Context, *, user: str = None):
+    """Expulse un membre"""
+    if not user:
+        return await ctx.send(embed=error_embed("Usage manquant", "❌ Utilisation : `+kick <user|id|@mention>`"))
+    target = await fetch_user_or_member(ctx, user)
+    if not target or not isinstance(target, discord.Member):
+        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Membre introuvable."))
+    try:
+        await target.kick(reason=f"Kick par {ctx.author}")
+        case = await record_case(ctx, target.id, "kick")
+        await ctx.send(embed=with_case(embed_action(discord.Color.orange(), "Expulsion", f"👢 {target.mention} a été expulsé !"), case))
+    except Exception as e:
+        await ctx.send(embed=error_embed("Erreur", "Impossible d'expulser cet utilisateur."))
+
+@bot.command(name="ban")
+@commands.has_permissions(ban_members=True)
+async def ban_cmd(ctx: commands.Context, *, user: str = None):
+    """Bannit un utilisateur"""
+    if not user:
+        return await ctx.send(embed=error_embed("Usage manquant", "❌ Utilisation : `+ban <user|id|@mention>`"))
+    target = await fetch_user_or_member(ctx, user)
+    if not target:
+        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Utilisateur introuvable."))
+    try:
+        if isinstance(target, discord.Member):
+            await target.ban(reason=f"Ban par {ctx.author}", delete_message_days=0)
+        else:
+            await ctx.guild.ban(discord.Object(id=int(target.id)), reason=f"Ban par {ctx.author}")
+        case = await record_case(ctx, target.id, "ban")
+        await ctx.send(embed=with_case(embed_action(discord.Color.red(), "Bannissement", f"⛔ {target.mention if isinstance(target, discord.Member) else target} a été banni !"), case))
+    except Exception as e:
+        await ctx.send(embed=error_embed("Erreur", "Impossible de bannir cet utilisateur."))
+
+@bot.command(name="unban")
+@commands.has_permissions(ban_members=True)
+async def unban_cmd(ctx: commands.Context, user_id: str = None):
+    """Débannit un utilisateur"""
+    if not user_id or not user_id.isdigit():
+        return await ctx.send(embed=error_embed("ID invalide", "❌ Utilisation : `+unban <user_id>`"))
+    try:
+        user = await fetch_user_cached(int(user_id))
+        if user is None:
+            return await ctx.send(embed=error_embed("Erreur", "Impossible de débannir (ID invalide ou pas banni)."))
+        await ctx.guild.unban(user, reason=f"Unban par {ctx.author}")
+        await action_scheduler.cancel(ctx.guild.id, user.id, "unban")
+        case = await record_case(ctx, user.id, "unban")
+        await ctx.send(embed=with_case(embed_action(discord.Color.green(), "Débannissement", f"✅ {user} a été débanni."), case))
+    except Exception as e:
+        await ctx.send(embed=error_embed("Erreur", "Impossible de débannir (ID invalide ou pas banni)."))
+
+@bot.command(name="mute")
+@commands.has_permissions(moderate_members=True)
+async def mute_cmd(ctx: commands.Context, user: str = None, duration: str = None):
+    """Met un membre en timeout"""
+    if not user or not duration:
+        return await ctx.send(embed=error_embed(
+            "Usage manquant",
+            "❌ Utilisation : `+mute <user|id|@mention> <durée>`\n"
+            f"Exemple : 10m, 1h, 2d\n💡 Au-delà de 28 jours : rôle **{MUTED_ROLE_NAME}** retiré automatiquement"
+        ))
+    
+    seconds = parse_duration(duration)
+    if seconds is None or seconds <= 0:
+        return await ctx.send(embed=error_embed(
+            "Durée invalide",
+            "❌ Exemple : 30s, 10m, 1h, 2d, 90d"
+        ))
+    
+    target = await fetch_user_or_member(ctx, user)
+    if not target or not isinstance(target, discord.Member):
+        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Membre introuvable."))
+    
+    # Les timeouts Discord sont limités à 28 jours : au-delà, rôle Muted et fin de mute planifiée
+    muted_role = None
+    if seconds > TIMEOUT_MAX:
+        muted_role = discord.utils.get(ctx.guild.roles, name=MUTED_ROLE_NAME)
+        if muted_role is None:
+            return await ctx.send(embed=error_embed(
+                "Rôle introuvable",
+                f"❌ Un mute de plus de 28 jours utilise le rôle **{MUTED_ROLE_NAME}**, introuvable sur ce serveur."
+            ))
+    
+    try:
+        if muted_role is None:
+            timeout_until = discord.utils.utcnow() + datetime.timedelta(seconds=seconds)
+            await target.timeout(timeout_until, reason=f"Mute par {ctx.author}")
+        else:
+            await add_member_roles(target, muted_role, reason=f"Mute par {ctx.author} ({duration})")
+            await action_scheduler.schedule(
+                ctx.guild.id, "unmute", target.id, time.time() + seconds,
+                role_id=muted_role.id, reason=f"Fin du mute de {duration} (par {ctx.author})"
+            )
+        case = await record_case(ctx, target.id, "mute", duration=seconds)
+        
+        try:
+            await target.send(f"🔇 Tu as été mis en timeout sur **{ctx.guild.name}** pour {duration}.")
+        except:
+            pass
+        
+        await ctx.send(embed=with_case(embed_action(
+            discord.Color.dark_magenta(),
+            "Timeout",
+            f"🔇 {target.mention} a été mis en timeout pour {duration}."
+        ), case))
+    except Exception as e:
+        await ctx.send(embed=error_embed("Erreur", "Impossible de mute cet utilisateur."))
+
+@bot.command(name="unmute")
+@commands.has_permissions(moderate_members=True)
+async def unmute_cmd(ctx: commands.Context, *, user: str = None):
+    """Retire le timeout d'un membre"""
+    if not user:
+        return await ctx.send(embed=error_embed("Usage manquant", "❌ Utilisation : `+unmute <user|id|@mention>`"))
+    
+    # Annuler un mute est sans risque : un préfixe de nom unique suffit
+    target = await fetch_user_or_member(ctx, user, allow_prefix=True)
+    if not target or not isinstance(target, discord.Member):
+        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Membre introuvable."))
+    
+    muted_role = discord.utils.get(target.roles, name=MUTED_ROLE_NAME)
+    if target.timed_out_until is None and muted_role is None:
+        return await ctx.send(embed=error_embed("Non mute", "❌ Cet utilisateur n'est pas en timeout."))
+    
+    try:
+        if target.timed_out_until is not None:
+            await target.timeout(None, reason=f"Unmute par {ctx.author}")
+        if muted_role is not None:
+            await remove_member_roles(target, muted_role, reason=f"Unmute par {ctx.author}")
+        await action_scheduler.cancel(ctx.guild.id, target.id, "unmute")
+        case = await record_case(ctx, target.id, "unmute")
+        
+        try:
+            await target.send(f"✅ Ton timeout sur **{ctx.guild.name}** a été levé !")
+        except:
+            pass
+        
+        await ctx.send(embed=with_case(embed_action(discord.Color.green(), "Unmute", f"🔊 {target.mention} a été unmute !"), case))
+    except Exception as e:
+        await ctx.send(embed=error_embed("Erreur", "Impossible d'unmute cet utilisateur."))
+
+@bot.command(name="tempban")
+@commands.has_permissions(ban_members=True)
+async def tempban_cmd(ctx: commands.Context, user: str = None, duration: str = None, *, reason: str = None):
+    """Bannit un utilisateur pour une durée limitée"""
+    seconds = parse_duration(duration) if duration else None
+    if not user or seconds is None or seconds <= 0:
+        return await ctx.send(embed=error_embed(
+            "Usage manquant",
+            "❌ Utilisation : `+tempban <user|id|@mention> <durée> [raison]`\nExemple : 12h, 7d, 90d"
+        ))
+
+    target = await fetch_user_or_member(ctx, user)
+    if not target:
+        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Utilisateur introuvable."))
+    if isinstance(target, discord.Member) and is_protected_target(ctx, target):
+        return await ctx.send(embed=error_embed("Action impossible", "❌ Tu ne peux pas bannir ce membre."))
+
+    audit_reason = f"Ban temporaire ({duration}) par {ctx.author}" + (f" : {reason}" if reason else "")
+    try:
+        await ctx.guild.ban(discord.Object(id=target.id), reason=audit_reason, delete_message_days=0)
+    except Exception as e:
+        return await ctx.send(embed=error_embed("Erreur", "Impossible de bannir cet utilisateur."))
+
+    await action_scheduler.schedule(
+        ctx.guild.id, "unban", target.id, time.time() + seconds,
+        reason=f"Fin du ban de {duration} (par {ctx.author})"
+    )
+    case = await record_case(ctx, target.id, "ban", reason, seconds)
+    await ctx.send(embed=with_case(embed_action(
+        discord.Color.red(),
+        "Bannissement temporaire",
+        f"⛔ {target.mention if isinstance(target, discord.Member) else target} a été banni pour {duration}."
+    ), case))
+
+@bot.command(name="temprole")
+@commands.has_permissions(manage_roles=True)
+async def temprole_cmd(ctx: commands.Context, user: str = None, role: discord.Role = None, duration: str = None):
+    """Donne un rôle qui sera retiré automatiquement"""
+    seconds = parse_duration(duration) if duration else None
+    if not user or not role or seconds is None or seconds <= 0:
+        return await ctx.send(embed=error_embed(
+            "Usage manquant",
+            "❌ Utilisation : `+temprole <user|id|@mention> <@role> <durée>`\nExemple : 1h, 7d, 30d"
+        ))
+
+    target = await fetch_user_or_member(ctx, user)
+    if not target or not isinstance(target, discord.Member):
+        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Membre introuvable."))
+    if role >= ctx.guild.me.top_role or (ctx.author.id != ctx.guild.owner_id and role >= ctx.author.top_role):
+        return await ctx.send(embed=error_embed("Rôle trop élevé", f"❌ Impossible de gérer {role.mention} (hiérarchie des rôles)."))
+
+    try:
+        await add_member_roles(target, role, reason=f"Rôle temporaire ({duration}) par {ctx.author}")
+    except Exception as e:
+        return await ctx.send(embed=error_embed("Erreur", "Impossible d'ajouter ce rôle."))
+
+    await action_scheduler.schedule(
+        ctx.guild.id, "remove_role", target.id, time.time() + seconds,
+        role_id=role.id, reason=f"Fin du rôle temporaire de {duration} (par {ctx.author})"
+    )
+    await ctx.send(embed=embed_action(
+        discord.Color.green(),
+        "Rôle temporaire",
+        f"⏳ {role.mention} donné à {target.mention} pour {duration}."
+    ))
+
+# -------------------- Modération groupée --------------------
+USER_ID_PATTERN = re.compile(r"<@!?(\d{15,21})>|\b(\d{15,21})\b")
+
+async def collect_target_ids(ctx: commands.Context, raw: Optional[str]) -> Tuple[List[int], Optional[str]]:
+    """Extrait les IDs (mentions, IDs, fichier joint) et la raison optionnelle après `|`"""
+    text, _, reason = (raw or "").partition("|")
+    for attachment in ctx.message.attachments[:1]:
+        if attachment.size <= 1024 * 1024:
+            text += "\n" + (await attachment.read()).decode("utf-8", "ignore")
+    ids = list(dict.fromkeys(int(mention or plain) for mention, plain in USER_ID_PATTERN.findall(text)))
+    return ids, reason.strip() or None
+
+class MassActionReport:
+    """Résultat par cible d'une commande de modération groupée"""
+    LABELS = {
+        "ok": "✅ Réussis",
+        "failed": "❌ Échecs",
+        "protected": "🛡️ Ignorés (hiérarchie)",
+        "not_found": "❓ Introuvables",
+    }
+
+    def __init__(self):
+        self.outcomes: Dict[str, List[int]] = {key: [] for key in self.LABELS}
+
+    def add(self, outcome: str, user_id: int):
+        self.outcomes[outcome].append(user_id)
+
+    def embed(self, title: str, color: discord.Color) -> discord.Embed:
+        total = sum(len(ids) for ids in self.outcomes.values())
+        embed = discord.Embed(title=title, description=f"{total} cible(s) traitée(s)", color=color)
+        for outcome, ids in self.outcomes.items():
+            if not ids:
+                continue
+            listing = " ".join(f"`{user_id}`" for user_id in ids[:30])
+            if len(ids) > 30:
+                listing += f" … (+{len(ids) - 30})"
+            embed.add_field(name=f"{self.LABELS[outcome]} : {len(ids)}", value=listing[:1024], inline=False)
+        return embed
+
+    def file(self) -> Optional[discord.File]:
+        """Détail complet en pièce jointe quand la liste ne tient pas dans l'embed"""
+        if all(len(ids) <= 30 for ids in self.outcomes.values()):
+            return None
+        lines = [f"{user_id}\t{outcome}" for outcome, ids in self.outcomes.items() for user_id in ids]
+        return discord.File(io.BytesIO("\n".join(lines).encode("utf-8")), filename="resultats.txt")
+
+def is_protected_target(ctx: commands.Context, member: discord.Member) -> bool:
+    """Empêche d'agir sur soi-même, le bot, le propriétaire ou un rôle supérieur ou égal au sien"""
+    if member.id in (ctx.author.id, ctx.guild.me.id, ctx.guild.owner_id):
+        return True
+    return ctx.author.id != ctx.guild.owner_id and member.top_role >= ctx.author.top_role
+
+async def ban_ids_individually(guild: discord.Guild, user_ids: List[int], reason: str) -> Tuple[List[int], List[int]]:
+    """Un appel `guild.ban` par utilisateur (concurrence bornée) ; retourne (bannis, échecs)"""
+    async def ban(user_id: int):
+        await guild.ban(discord.Object(id=user_id), reason=reason, delete_message_seconds=0)
+    results = await run_bounded(user_ids, ban, concurrency=MASS_ACTION_WORKERS)
+    banned = [user_id for user_id, result in zip(user_ids, results) if not isinstance(result, Exception)]
+    failed = [user_id for user_id, result in zip(user_ids, results) if isinstance(result, Exception)]
+    return banned, failed
+
+async def bulk_ban_ids(guild: discord.Guild, user_ids: List[int], reason: str) -> Tuple[List[int], List[int]]:
+    """Bannit par lots de 200 via l'endpoint bulk-ban ; retourne (bannis, échecs)"""
+    # bulk-ban exige aussi la permission Gérer le serveur : sans elle, un ban par utilisateur
+    if not guild.me.guild_permissions.manage_guild:
+        return await ban_ids_individually(guild, user_ids, reason)
+    
+    banned: List[int] = []
+    failed: List[int] = []
+    for start in range(0, len(user_ids), BULK_BAN_CHUNK):
+        chunk = user_ids[start:start + BULK_BAN_CHUNK]
+        try:
+            if hasattr(guild, "bulk_ban"):  # discord.py >= 2.4
+                result = await guild.bulk_ban([discord.Object(id=user_id) for user_id in chunk], reason=reason, delete_message_seconds=0)
+                banned.extend(user.id for user in result.banned)
+                failed.extend(user.id for user in result.failed)
+            else:
+                data = await bot.http.request(
+                    discord.http.Route("POST", "/guilds/{guild_id}/bulk-ban", guild_id=guild.id),
+                    json={"user_ids": [str(user_id) for user_id in chunk], "delete_message_seconds": 0},
+                    reason=reason
+                )
+                banned.extend(int(user_id) for user_id in data.get("banned_users", []))
+                failed.extend(int(user_id) for user_id in data.get("failed_users", []))
+        except discord.Forbidden as e:
+            # Permission refusée sur l'endpoint groupé (pas forcément sur les bans) : repli sur le ban individuel
+            print(f"[MOD] bulk-ban refusé ({e}), bans individuels")
+            chunk_banned, chunk_failed = await ban_ids_individually(guild, chunk, reason)
+            banned.extend(chunk_banned)
+            failed.extend(chunk_failed)
+        except discord.HTTPException as e:
+            # L'API répond en erreur quand aucun utilisateur du lot n'a pu être banni
+            print(f"[MOD] Erreur bulk-ban: {e}")
+            failed.extend(chunk)
+    return banned, failed
+
+async def run_member_actions(ctx: commands.Context, user_ids: List[int],
+                             action: Callable[[discord.Member], Awaitable[Any]]) -> MassActionReport:
+    """Applique une action à chaque membre ciblé avec une concurrence bornée"""
+    report = MassActionReport()
+    members = []
+    for user_id in user_ids:
+        member = ctx.guild.get_member(user_id)
+        if member is None:
+            report.add("not_found", user_id)
+        elif is_protected_target(ctx, member):
+            report.add("protected", user_id)
+        else:
+            members.append(member)
+    
+    results = await run_bounded(members, action, concurrency=MASS_ACTION_WORKERS)
+    for member, result in zip(members, results):
+        report.add("failed" if isinstance(result, Exception) else "ok", member.id)
+    return report
+
+async def send_mass_report(ctx: commands.Context, report: MassActionReport, title: str, color: discord.Color,
+                           cases: Optional[List[int]] = None):
+    embed = with_case(report.embed(title, color), cases or [])
+    file = report.file()
+    if file:
+        await ctx.send(embed=embed, file=file)
+    else:
+        await ctx.send(embed=embed)
+
+async def check_mass_targets(ctx: commands.Context, user_ids: List[int], usage: str) -> bool:
+    if not user_ids:
+        await ctx.send(embed=error_embed("Usage manquant", usage))
+        return False
+    if len(user_ids) > MASS_ACTION_MAX:
+        await ctx.send(embed=error_embed("Trop de cibles", f"❌ Maximum {MASS_ACTION_MAX} utilisateurs par commande."))
+        return False
+    return True
+
+@bot.command(name="massban")
+@commands.has_permissions(ban_members=True)
+async def massban_cmd(ctx: commands.Context, *, targets: str = None):
+    """Bannit plusieurs utilisateurs d'un coup (endpoint bulk-ban)"""
+    user_ids, reason = await collect_target_ids(ctx, targets)
+    usage = "❌ Utilisation : `+massban <ids|@mentions...> [| raison]` (ou fichier .txt d'IDs joint)"
+    if not await check_mass_targets(ctx, user_ids, usage):
+        return
+    
+    report = MassActionReport()
+    to_ban = []
+    for user_id in user_ids:
+        member = ctx.guild.get_member(user_id)
+        if member is not None and is_protected_target(ctx, member):
+            report.add("protected", user_id)
+        else:
+            to_ban.append(user_id)
+    
+    progress_message = await ctx.send(f"⛔ Bannissement de {len(to_ban)} utilisateur(s)...")
+    banned, failed = await bulk_ban_ids(ctx.guild, to_ban, f"Ban groupé par {ctx.author}" + (f" : {reason}" if reason else ""))
+    for user_id in banned:
+        report.add("ok", user_id)
+    for user_id in failed:
+        report.add("failed", user_id)
+    
+    cases = await record_cases(ctx, report.outcomes["ok"], "ban", reason)
+    await progress_message.delete()
+    await send_mass_report(ctx, report, "⛔ Bannissement groupé", discord.Color.red(), cases)
+
+@bot.command(name="masskick")
+@commands.has_permissions(kick_members=True)
+async def masskick_cmd(ctx: commands.Context, *, targets: str = None):
+    """Expulse plusieurs membres d'un coup"""
+    user_ids, reason = await collect_target_ids(ctx, targets)
+    usage = "❌ Utilisation : `+masskick <ids|@mentions...> [| raison]` (ou fichier .txt d'IDs joint)"
+    if not await check_mass_targets(ctx, user_ids, usage):
+        return
+    
+    audit_reason = f"Kick groupé par {ctx.author}" + (f" : {reason}" if reason else "")
+    progress_message = await ctx.send(f"👢 Expulsion de {len(user_ids)} membre(s)...")
+    report = await run_member_actions(ctx, user_ids, lambda member: member.kick(reason=audit_reason))
+    
+    cases = await record_cases(ctx, report.outcomes["ok"], "kick", reason)
+    await progress_message.delete()
+    await send_mass_report(ctx, report, "👢 Expulsion groupée", discord.Color.orange(), cases)
+
+@bot.command(name="massmute")
+@commands.has_permissions(moderate_members=True)
+async def massmute_cmd(ctx: commands.Context, duration: str = None, *, targets: str = None):
+    """Met plusieurs membres en timeout d'un coup"""
+    seconds = parse_duration(duration) if duration else None
+    if seconds is None or seconds <= 0 or seconds > TIMEOUT_MAX:
+        return await ctx.send(embed=error_embed(
+            "Durée invalide",
+            "❌ Utilisation : `+massmute <durée> <ids|@mentions...> [| raison]`\n⚠️ Maximum : 28 jours"
+        ))
+    
+    user_ids, reason = await collect_target_ids(ctx, targets)
+    usage = "❌ Utilisation : `+massmute <durée> <ids|@mentions...> [| raison]` (ou fichier .txt d'IDs joint)"
+    if not await check_mass_targets(ctx, user_ids, usage):
+        return
+    
+    timeout_until = discord.utils.utcnow() + datetime.timedelta(seconds=seconds)
+    audit_reason = f"Mute groupé par {ctx.author}" + (f" : {reason}" if reason else "")
+    progress_message = await ctx.send(f"🔇 Timeout de {len(user_ids)} membre(s)...")
+    report = await run_member_actions(ctx, user_ids, lambda member: member.timeout(timeout_until, reason=audit_reason))
+    
+    cases = await record_cases(ctx, report.outcomes["ok"], "mute", reason, seconds)
+    await progress_message.delete()
+    await send_mass_report(ctx, report, f"🔇 Timeout groupé ({duration})", discord.Color.dark_magenta(), cases)
+
+# -------------------- Commandes de sanctions --------------------
+CASES_PAGE_SIZE = 10
+
+def format_duration(seconds: int) -> str:
+    """Inverse de parse_duration : 5400 -> "1h30m" """
+    parts = []
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60), ("s", 1)):
+        if seconds >= size:
+            parts.append(f"{seconds // size}{unit}")
+            seconds %= size
+    return "".join(parts) or "0s"
+
+def case_line(case: Dict[str, Any], show_user: bool = True) -> str:
+    """Une ligne de la liste des sanctions"""
+    line = f"**#{case['case_number']}** {CASE_ACTIONS.get(case['action'], case['action'])}"
+    if case["duration"]:
+        line += f" ({format_duration(case['duration'])})"
+    if show_user:
+        line += f" • <@{case['user_id']}>"
+    line += f" • par <@{case['moderator_id']}> • <t:{int(case['created_at'])}:R>"
+    if case["reason"]:
+        line += f"\n└ {case['reason'][:100]}"
+    return line
+
+class CasePaginator(discord.ui.View):
+    """Pages de sanctions : chaque page repart du dernier numéro affiché (pas d'OFFSET)"""
+    def __init__(self, author_id: int, guild_id: int, title: str, column: Optional[str] = None, value: Optional[int] = None):
+        super().__init__(timeout=180)
+        self.author_id = author_id
+        self.guild_id = guild_id
+        self.title = title
+        self.column = column
+        self.value = value
+        self.cases: List[Dict[str, Any]] = []
+        self.page_number = 1
+        self.total = 0
+        self.message: Optional[discord.Message] = None
+
+    async def load(self, before: Optional[int] = None, after: Optional[int] = None) -> bool:
+        """Charge une page ; retourne False si elle est vide"""
+        cases = await run_case_query(case_store.page, self.guild_id, self.column, self.value,
+                                     before=before, after=after, limit=CASES_PAGE_SIZE)
+        if not cases:
+            return False
+        self.cases = cases
+        first, last = cases[0]["case_number"], cases[-1]["case_number"]
+        # Une requête d'une ligne de chaque côté suffit à savoir s'il reste des pages
+        self.newer.disabled = not await run_case_query(case_store.page, self.guild_id, self.column, self.value, after=first, limit=1)
+        self.older.disabled = not await run_case_query(case_store.page, self.guild_id, self.column, self.value, before=last, limit=1)
+        return True
+
+    def embed(self) -> discord.Embed:
+        pages = max(1, math.ceil(self.total / CASES_PAGE_SIZE))
+        embed = discord.Embed(
+            title=self.title,
+            description="\n".join(case_line(case, show_user=self.column != "user_id") for case in self.cases),
+            color=discord.Color.orange()
+        )
+        embed.set_footer(text=f"Page {self.page_number}/{pages} • {self.total} sanction(s)")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("❌ Seul l'auteur de la commande peut changer de page.", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self):
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.button(label="◀️ Plus récentes", style=discord.ButtonStyle.secondary)
+    async def newer(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if await self.load(after=self.cases[0]["case_number"]):
+            self.page_number -= 1
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(label="Plus anciennes ▶️", style=discord.ButtonStyle.secondary)
+    async def older(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if await self.load(before=self.cases[-1]["case_number"]):
+            self.page_number += 1
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+@bot.command(name="warn")
+@commands.has_permissions(moderate_members=True)
+async def warn_cmd(ctx: commands.Context, user: str = None, *, reason: str = None):
+    """Avertit un membre (enregistré dans l'historique des sanctions)"""
+    if not user:
+        return await ctx.send(embed=error_embed("Usage manquant", "❌ Utilisation : `+warn <user|id|@mention> [raison]`"))
+
+    target = await fetch_user_or_member(ctx, user)
+    if not target or not isinstance(target, discord.Member):
+        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Membre introuvable."))
+    if is_protected_target(ctx, target):
+        return await ctx.send(embed=error_embed("Action impossible", "❌ Tu ne peux pas avertir ce membre."))
+
+    case = await record_case(ctx, target.id, "warn", reason)
+    if case is None:
+        return await ctx.send(embed=error_embed("Erreur", "Impossible d'enregistrer l'avertissement."))
+    warnings = await run_case_query(case_store.count, ctx.guild.id, "user_id", target.id)
+
+    try:
+        await target.send(f"⚠️ Tu as reçu un avertissement sur **{ctx.guild.name}**" + (f" : {reason}" if reason else "."))
+    except:
+        pass
+
+    await ctx.send(embed=with_case(embed_action(
+        discord.Color.gold(),
+        "Avertissement",
+        f"⚠️ {target.mention} a été averti." + (f"\n📝 {reason}" if reason else "") + f"\n📁 {warnings} sanction(s) au total"
+    ), case))
+
+@bot.command(name="cases")
+@commands.has_permissions(moderate_members=True)
+async def cases_cmd(ctx: commands.Context, *, user: str = None):
+    """Historique des sanctions d'un membre, d'un modérateur (`mod <user>`) ou du serveur"""
+    column, value, title = None, None, f"📁 Sanctions de {ctx.guild.name}"
+    if user:
+        by_moderator = user.lower().startswith("mod ")
+        query = user[4:].strip() if by_moderator else user
+        target = await fetch_user_or_member(ctx, query, allow_prefix=True)
+        if target is None:
+            # Membre parti : l'historique reste consultable par ID
+            if not query.isdigit():
+                return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Utilisateur introuvable."))
+            target_id, target_name = int(query), query
+        else:
+            target_id, target_name = target.id, str(target)
+        column = "moderator_id" if by_moderator else "user_id"
+        value = target_id
+        title = f"📁 Sanctions données par {target_name}" if by_moderator else f"📁 Sanctions de {target_name}"
+
+    view = CasePaginator(ctx.author.id, ctx.guild.id, title, column, value)
+    view.total = await run_case_query(case_store.count, ctx.guild.id, column, value)
+    if not await view.load():
+        return await ctx.send(embed=embed_action(discord.Color.green(), "Historique vide", "✅ Aucune sanction enregistrée."))
+
+    embed = view.embed()
+    if column is None:
+        recent = await run_case_query(case_store.count, ctx.guild.id, since=time.time() - 86400)
+        embed.description += f"\n\n🕒 Dernières 24h : {recent} sanction(s)"
+    view.message = await ctx.send(embed=embed, view=view)
+
+@bot.command(name="case")
+@commands.has_permissions(moderate_members=True)
+async def case_cmd(ctx: commands.Context, case_number: str = None):
+    """Détail d'une sanction"""
+    case_number = (case_number or "").lstrip("#")
+    if not case_number.isdigit():
+        return await ctx.send(embed=error_embed("Numéro invalide", "❌ Utilisation : `+case <numéro>`"))
+
+    case = await run_case_query(case_store.get, ctx.guild.id, int(case_number))
+    if case is None:
+        return await ctx.send(embed=error_embed("Sanction introuvable", f"❌ Aucune sanction #{case_number} sur ce serveur."))
+
+    embed = discord.Embed(
+        title=f"📁 Sanction #{case['case_number']} — {CASE_ACTIONS.get(case['action'], case['action'])}",
+        color=discord.Color.orange()
+    )
+    embed.add_field(name="Membre", value=f"<@{case['user_id']}> (`{case['user_id']}`)", inline=True)
+    embed.add_field(name="Modérateur", value=f"<@{case['moderator_id']}>", inline=True)
+    embed.add_field(name="Date", value=f"<t:{int(case['created_at'])}:f>", inline=True)
+    if case["duration"]:
+        embed.add_field(name="Durée", value=format_duration(case["duration"]), inline=True)
+    embed.add_field(name="Raison", value=case["reason"] or "Aucune raison", inline=False)
+    await ctx.send(embed=embed)
+
+# -------------------- Anti-spam --------------------
+AUTOMOD_DEFAULTS: Dict[str, Any] = {
+    "enabled": False,
+    "rate_messages": 6,           # messages d'un membre...
+    "rate_seconds": 5.0,          # ...en moins de tant de secondes
+    "duplicate_messages": 3,      # messages identiques d'un membre...
+    "duplicate_seconds": 30.0,    # ...en moins de tant de secondes
+    "mentions": 6,                # mentions max dans un message
+    "channel_messages": 30,       # messages dans un salon (tous membres)...
+    "channel_seconds": 5.0,       # ...en moins de tant de secondes
+    "actions": ["delete", "alert"],
+    "timeout": 600,               # secondes
+    "alert_channel_id": None,
+    "raid": True,                 # détection des messages copiés par plusieurs comptes
+    "raid_authors": 4,            # auteurs distincts d'un même contenu...
+    "raid_window": 120.0,         # ...en moins de tant de secondes
+    "raid_similarity": 0.6,       # similarité MinHash (Jaccard estimé) à partir de laquelle deux messages sont proches
+    "raid_action": "kick",        # sanction des comptes encore non vérifiés
+}
+AUTOMOD_LIMITS = {  # bornes des réglages numériques (les anneaux sont dimensionnés d'après elles)
+    "rate_messages": (2, 50), "rate_seconds": (1, 300),
+    "duplicate_messages": (2, 10), "duplicate_seconds": (1, 3600),
+    "mentions": (1, 100),
+    "channel_messages": (5, 500), "channel_seconds": (1, 300),
+    "timeout": (10, TIMEOUT_MAX),
+    "raid_authors": (2, 50), "raid_window": (10, 3600), "raid_similarity": (0.3, 1.0),
+}
+AUTOMOD_ACTIONS = ("delete", "timeout", "alert")
+RAID_ACTIONS = ("kick", "ban", "timeout")
+AUTOMOD_RULES = {
+    "rate": "Rafale de messages",
+    "duplicate": "Messages répétés",
+    "mentions": "Mentions en masse",
+    "channel": "Flood du salon",
+    "raid": "Raid (même message, plusieurs comptes)",
+    "words": "Mot interdit",
+}
+AUTOMOD_DETECTIONS = metrics.register(Counter("hoshikuzu_automod_detections_total", "Détections anti-spam", ("rule",)))
+
+automod_config = load_config("automod")
+
+def automod_settings(guild_id: str) -> Dict[str, Any]:
+    """Réglages anti-spam du serveur, complétés par les valeurs par défaut"""
+    return {**AUTOMOD_DEFAULTS, **automod_config.get(guild_id, {})}
+
+class TimestampRing:
+    """Les N derniers horodatages dans un tableau fixe : « N événements en moins de W secondes » en O(1)"""
+    __slots__ = ("times", "index", "count")
+
+    def __init__(self, size: int):
+        self.times = array("d", bytes(8 * size))
+        self.index = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def push(self, now: float, window: float) -> bool:
+        """Ajoute un événement ; True si les N derniers tiennent dans la fenêtre"""
+        size = len(self.times)
+        self.times[self.index] = now
+        self.index = (self.index + 1) % size
+        self.count = min(self.count + 1, size)
+        # Le prochain emplacement à écraser contient le plus ancien des N derniers
+        return self.count == size and now - self.times[self.index] <= window
+
+class UserFloodState:
+    __slots__ = ("rate", "hashes", "hash_times", "hash_index", "last_action")
+
+    def __init__(self, rate_size: int, duplicate_size: int):
+        self.rate = TimestampRing(rate_size)
+        self.hashes = array("q", bytes(8 * duplicate_size))
+        self.hash_times = array("d", bytes(8 * duplicate_size))
+        self.hash_index = 0
+        self.last_action = 0.0
+
+    def push_hash(self, content_hash: int, now: float, window: float) -> int:
+        """Ajoute l'empreinte d'un message ; retourne le nombre de copies récentes (anneau de taille bornée)"""
+        size = len(self.hashes)
+        self.hashes[self.hash_index] = content_hash
+        self.hash_times[self.hash_index] = now
+        self.hash_index = (self.hash_index + 1) % size
+        return sum(1 for i in range(size) if self.hashes[i] == content_hash and now - self.hash_times[i] <= window)
+
+class ChannelFloodState:
+    __slots__ = ("rate", "last_action")
+
+    def __init__(self, size: int):
+        self.rate = TimestampRing(size)
+        self.last_action = 0.0
+
+class FloodDetector:
+    """Compteurs glissants par membre et par salon, en LRU borné à AUTOMOD_MAX_TRACKED entrées chacun"""
+    def __init__(self, max_tracked: int):
+        self.max_tracked = max_tracked
+        self.users: "OrderedDict[Tuple[int, int], UserFloodState]" = OrderedDict()
+        self.channels: "OrderedDict[int, ChannelFloodState]" = OrderedDict()
+        self.stats = {"messages": 0, "detections": 0, "evicted": 0}
+
+    def _state(self, table: OrderedDict, key: Any, factory: Callable[[], Any]) -> Any:
+        state = table.get(key)
+        if state is None:
+            state = table[key] = factory()
+            if len(table) > self.max_tracked:
+                table.popitem(last=False)
+                self.stats["evicted"] += 1
+        else:
+            table.move_to_end(key)
+        return state
+
+    def check(self, message: discord.Message, config: Dict[str, Any], now: float) -> Tuple[List[str], UserFloodState, ChannelFloodState]:
+        """Règles déclenchées par un message (travail constant par message)"""
+        self.stats["messages"] += 1
+        rules = []
+
+        # Anneau d'empreintes deux fois plus grand que le seuil : alterner deux messages ne suffit pas à passer
+        duplicate_size = config["duplicate_messages"] * 2
+        user = self._state(self.users, (message.guild.id, message.author.id),
+                           lambda: UserFloodState(config["rate_messages"], duplicate_size))
+        if len(user.rate) != config["rate_messages"] or len(user.hashes) != duplicate_size:
+            # Réglages modifiés : on repart de zéro pour ce membre
+            user = self.users[(message.guild.id, message.author.id)] = UserFloodState(config["rate_messages"], duplicate_size)
+        if user.rate.push(now, config["rate_seconds"]):
+            rules.append("rate")
+        content = message.content.casefold().strip()
+        if content and user.push_hash(hash(content), now, config["duplicate_seconds"]) >= config["duplicate_messages"]:
+            rules.append("duplicate")
+        mentions = len(message.raw_mentions) + len(message.raw_role_mentions) + (10 if message.mention_everyone else 0)
+        if mentions >= config["mentions"]:
+            rules.append("mentions")
+
+        channel = self._state(self.channels, message.channel.id, lambda: ChannelFloodState(config["channel_messages"]))
+        if len(channel.rate) != config["channel_messages"]:
+            channel = self.channels[message.channel.id] = ChannelFloodState(config["channel_messages"])
+        if channel.rate.push(now, config["channel_seconds"]):
+            rules.append("channel")
+
+        if rules:
+            self.stats["detections"] += 1
+            for rule in rules:
+                AUTOMOD_DETECTIONS.inc(rule)
+        return rules, user, channel
+
+flood_detector = FloodDetector(AUTOMOD_MAX_TRACKED)
+
+RAID_MENTION_PATTERN = re.compile(r"<@[!&]?\d+>|@everyone|@here")
+RAID_INVITE_PATTERN = re.compile(r"((?:https?://)?(?:www\.)?(?:discord\.gg|discord(?:app)?\.com/invite)/)\S*", re.IGNORECASE)
+RAID_URL_PATTERN = re.compile(r"(?:https?://)?[\w.-]+\.[a-z]{2,}/\S*", re.IGNORECASE)
+MASK64 = (1 << 64) - 1
+MINHASH_SIZE = 16        # valeurs par signature (une par tranche de l'espace de hachage)
+MINHASH_ROWS = 2         # valeurs par bande LSH (8 bandes)
+MINHASH_BIN_SHIFT = 60   # 4 bits de poids fort = numéro de tranche
+
+def normalize_raid_content(text: str) -> str:
+    """Texte comparé entre comptes : sans mentions ni code d'invitation (ils changent d'un raider à l'autre), casse et espaces unifiés"""
+    # Les autres liens gardent leur chemin : deux GIF différents du même site ne se ressemblent pas
+    text = RAID_INVITE_PATTERN.sub(r"\1", RAID_MENTION_PATTERN.sub(" ", text))
+    return " ".join(text.casefold().split())
+
+def minhash_signature(text: str) -> Tuple[Optional[int], ...]:
+    """Signature MinHash des 4-grammes de caractères en un seul passage : minimum par tranche de l'espace de hachage"""
+    signature: List[Optional[int]] = [None] * MINHASH_SIZE
+    for gram in {text[i:i + 4] for i in range(max(1, len(text) - 3))}:
+        value = hash(gram) & MASK64
+        slot = value >> MINHASH_BIN_SHIFT
+        current = signature[slot]
+        if current is None or value < current:
+            signature[slot] = value
+    return tuple(signature)
+
+def minhash_similarity(first: Tuple[Optional[int], ...], second: Tuple[Optional[int], ...]) -> float:
+    """Part des tranches au même minimum : estime la similarité de Jaccard"""
+    return sum(x == y and x is not None for x, y in zip(first, second)) / MINHASH_SIZE
+
+class RaidEntry:
+    __slots__ = ("time", "author_id", "author", "channel_id", "message_id", "cluster")
+
+    def __init__(self, now: float, message: discord.Message):
+        self.time = now
+        self.author_id = message.author.id
+        # Gardé pour la sanction : sans chargement complet des membres, get_member peut ne pas le connaître
+        self.author: discord.Member = message.author
+        self.channel_id = message.channel.id
+        self.message_id = message.id
+        self.cluster: Optional["RaidCluster"] = None
+
+class RaidCluster:
+    """Messages identiques ou proches encore dans la fenêtre, avec leurs auteurs"""
+    __slots__ = ("signature", "sample", "entries", "authors", "exact_keys", "band_keys", "flagged", "handled")
+
+    def __init__(self, signature: Tuple[int, ...], sample: str):
+        self.signature = signature
+        self.sample = sample
+        self.entries: deque = deque()
+        self.authors: Dict[int, int] = {}
+        self.exact_keys: Set[int] = set()
+        self.band_keys: List[Tuple[int, Tuple[int, ...]]] = []
+        self.flagged = False
+        self.handled: Set[int] = set()
+
+class GuildRaidIndex:
+    """Empreintes des messages récents d'un serveur : dictionnaire pour les doublons exacts, bandes LSH pour les quasi-doublons"""
+    def __init__(self):
+        self.entries: deque = deque()
+        self.exact: Dict[int, RaidCluster] = {}
+        self.bands: Dict[Tuple[int, Tuple[int, ...]], List[RaidCluster]] = {}
+
+    @staticmethod
+    def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+        # Deux textes de similarité s partagent une bande donnée avec une probabilité s², au moins une sur 8 presque sûrement
+        # Les tranches vides (textes courts) ne doivent pas rapprocher deux messages
+        return [(start, band) for start in range(0, MINHASH_SIZE, MINHASH_ROWS)
+                if None not in (band := signature[start:start + MINHASH_ROWS])]
+
+    def _drop_oldest(self):
+        entry = self.entries.popleft()
+        cluster = entry.cluster
+        cluster.entries.popleft()
+        cluster.authors[entry.author_id] -= 1
+        if not cluster.authors[entry.author_id]:
+            del cluster.authors[entry.author_id]
+        if cluster.entries:
+            return
+        for key in cluster.exact_keys:
+            if self.exact.get(key) is cluster:
+                del self.exact[key]
+        for key in cluster.band_keys:
+            bucket = self.bands.get(key)
+            if bucket is not None and cluster in bucket:
+                bucket.remove(cluster)
+                if not bucket:
+                    del self.bands[key]
+
+    def expire(self, now: float, window: float):
+        while self.entries and (self.entries[0].time <= now - window or len(self.entries) > RAID_MAX_ENTRIES):
+            self._drop_oldest()
+
+    def add(self, entry: RaidEntry, content: str, similarity: float) -> RaidCluster:
+        """Range le message dans le groupe d'un contenu identique ou proche (ou en crée un)"""
+        exact_key = hash(content)
+        cluster = self.exact.get(exact_key)
+        if cluster is None:
+            signature = minhash_signature(content)
+            bands = self._bands(signature)
+            best = similarity
+            for key in bands:
+                for candidate in self.bands.get(key, ()):
+                    score = minhash_similarity(candidate.signature, signature)
+                    if score >= best:
+                        cluster, best = candidate, score
+            if cluster is None:
+                # Seul le premier message d'un groupe le représente dans les bandes
+                cluster = RaidCluster(signature, content)
+                cluster.band_keys = bands
+                for key in bands:
+                    bucket = self.bands.setdefault(key, [])
+                    bucket.append(cluster)
+                    if len(bucket) > RAID_BUCKET_SIZE:
+                        # Texte très courant : seuls les groupes les plus récents restent comparables
+                        bucket.pop(0)
+            cluster.exact_keys.add(exact_key)
+            self.exact[exact_key] = cluster
+
+        entry.cluster = cluster
+        cluster.entries.append(entry)
+        cluster.authors[entry.author_id] = cluster.authors.get(entry.author_id, 0) + 1
+        self.entries.append(entry)
+        return cluster
+
+class RaidDetector:
+    """Repère un même contenu (ou presque) posté par plusieurs comptes, tous salons confondus"""
+    def __init__(self):
+        self.guilds: Dict[int, GuildRaidIndex] = {}
+        self.tasks: Set[asyncio.Task] = set()
+        self.stats = {"fingerprinted": 0, "clusters_flagged": 0}
+
+    def observe(self, message: discord.Message, config: Dict[str, Any], now: float) -> Tuple[Optional[RaidCluster], List[RaidEntry]]:
+        """Retourne (groupe signalé, messages à traiter) si ce message appartient à un raid"""
+        content = normalize_raid_content(message.content)
+        # Les messages courts (« salut », « gg ») et les liens seuls (GIF, vidéos) sont trop fréquents pour être comparés ;
+        # une invitation Discord, elle, suffit à rendre un message suspect
+        if not RAID_INVITE_PATTERN.search(content) and len(RAID_URL_PATTERN.sub("", content).strip()) < 30:
+            return None, []
+
+        index = self.guilds.get(message.guild.id)
+        if index is None:
+            index = self.guilds[message.guild.id] = GuildRaidIndex()
+        index.expire(now, config["raid_window"])
+        cluster = index.add(RaidEntry(now, message), content, config["raid_similarity"])
+        self.stats["fingerprinted"] += 1
+
+        if not cluster.flagged:
+            if len(cluster.authors) < config["raid_authors"]:
+                return None, []
+            cluster.flagged = True
+            self.stats["clusters_flagged"] += 1
+            AUTOMOD_DETECTIONS.inc("raid")
+            return cluster, list(cluster.entries)
+        return cluster, [cluster.entries[-1]]
+
+raid_detector = RaidDetector()
+
+async def handle_raid(guild: discord.Guild, config: Dict[str, Any], cluster: RaidCluster, entries: List[RaidEntry]):
+    """Supprime les messages du raid et sanctionne leurs auteurs, comptes non vérifiés en premier"""
+    by_channel: Dict[int, List[int]] = {}
+    for entry in entries:
+        by_channel.setdefault(entry.channel_id, []).append(entry.message_id)
+
+    authors = [author_id for author_id in dict.fromkeys(entry.author_id for entry in entries) if author_id not in cluster.handled]
+    cluster.handled.update(authors)
+    unverified_role_id = verification_config.get(str(guild.id), {}).get("unverified_role_id")
+
+    def is_unverified(member: Optional[discord.Member]) -> bool:
+        return member is not None and unverified_role_id is not None and member.get_role(unverified_role_id) is not None
+
+    known = {entry.author_id: entry.author for entry in entries}
+    members: List[discord.Member] = []
+    skipped = 0
+    for author_id in authors:
+        member = guild.get_member(author_id) or known.get(author_id)
+        if member is None:
+            try:
+                member = await guild.fetch_member(author_id)
+            except discord.HTTPException:
+                skipped += 1  # Déjà parti (ou API indisponible)
+                continue
+        if not member.guild_permissions.manage_messages:
+            members.append(member)
+    unverified = [member for member in members if is_unverified(member)]
+    verified = [member for member in members if not is_unverified(member)]
+    reason = f"Anti-raid : même message posté par {len(cluster.authors)} comptes"
+    timeout_until = discord.utils.utcnow() + datetime.timedelta(seconds=config["timeout"])
+
+    async def sanction(member: discord.Member, action: str) -> str:
+        if guild.me.top_role <= member.top_role:
+            return "ignoré"
+        if action == "kick":
+            await member.kick(reason=reason)
+        elif action == "ban":
+            await member.ban(reason=reason, delete_message_days=0)
+        else:
+            await member.timeout(timeout_until, reason=reason)
+        if bot.user:
+            case_action = "mute" if action == "timeout" else action
+            await run_case_query(case_store.add_many, guild.id, bot.user.id, case_action, [member.id], reason,
+                                 config["timeout"] if action == "timeout" else None)
+        return action
+
+    # Les comptes pas encore vérifiés passent d'abord : ce sont en général les comptes de raid
+    results = await run_bounded(unverified, lambda member: sanction(member, config["raid_action"]), concurrency=MASS_ACTION_WORKERS)
+    if "timeout" in config["actions"]:
+        results += await run_bounded(verified, lambda member: sanction(member, "timeout"), concurrency=MASS_ACTION_WORKERS)
+
+    deleted = 0
+    if "delete" in config["actions"]:
+        for channel_id, message_ids in by_channel.items():
+            channel = guild.get_channel(channel_id)
+            if channel is None:
+                continue
+            for start in range(0, len(message_ids), 100):
+                chunk = [discord.Object(id=message_id) for message_id in message_ids[start:start + 100]]
+                try:
+                    if len(chunk) == 1:
+                        await channel.get_partial_message(chunk[0].id).delete()
+                    else:
+                        await channel.delete_messages(chunk, reason=reason)
+                    deleted += len(chunk)
+                except discord.HTTPException as e:
+                    print(f"[AUTOMOD] Erreur suppression raid: {e}")
+
+    sanctioned = sum(1 for result in results if isinstance(result, str) and result != "ignoré")
+    if "alert" not in config["actions"] or len(entries) == 1 and not sanctioned:
+        return
+    alert_channel = guild.get_channel(config["alert_channel_id"]) if config["alert_channel_id"] else None
+    summary = (
+        f"**Auteurs :** {len(cluster.authors)} ({len(unverified)} non vérifié(s) traité(s) en priorité)\n"
+        f"**Salons :** {', '.join(f'<#{channel_id}>' for channel_id in by_channel)}\n"
+        f"**Messages supprimés :** {deleted}\n"
+        f"**Comptes sanctionnés :** {sanctioned} ({config['raid_action']} si non vérifié"
+        + (", timeout sinon)" if "timeout" in config["actions"] else ")")
+        + (f"\n**Comptes introuvables (non sanctionnés) :** {skipped}" if skipped else "")
+    )
+    if alert_channel is None:
+        print(f"[AUTOMOD] 🚨 Raid sur {guild.name} : {summary}")
+        return
+    embed = discord.Embed(title="🚨 Anti-raid", description=summary, color=discord.Color.dark_red())
+    embed.add_field(name="Contenu", value=cluster.sample[:1024], inline=False)
+    embed.timestamp = datetime.datetime.now()
+    try:
+        await alert_channel.send(embed=embed)
+    except discord.HTTPException as e:
+        print(f"[AUTOMOD] Erreur envoi alerte: {e}")
+
+async def send_automod_alert(message: discord.Message, config: Dict[str, Any], rules: List[str], actions: List[str], terms: Iterable[str] = ()):
+    channel = message.guild.get_channel(config["alert_channel_id"]) if config["alert_channel_id"] else None
+    if channel is None:
+        print(f"[AUTOMOD] {message.guild.name} #{message.channel} {message.author} : {', '.join(rules)}")
+        return
+    embed = discord.Embed(
+        title="🚨 Anti-spam",
+        description=(
+            f"**Membre :** {message.author.mention} (`{message.author.id}`)\n"
+            f"**Salon :** {message.channel.mention}\n"
+            f"**Détection :** {', '.join(AUTOMOD_RULES[rule] for rule in rules)}\n"
+            + (f"**Termes :** {', '.join(f'||{term}||' for term in terms)}\n" if terms else "")
+            + f"**Actions :** {', '.join(actions) or 'aucune'}"
+        ),
+        color=discord.Color.red()
+    )
+    if message.content:
+        embed.add_field(name="Message", value=message.content[:1024], inline=False)
+    embed.timestamp = datetime.datetime.now()
+    try:
+        await channel.send(embed=embed)
+    except discord.HTTPException as e:
+        print(f"[AUTOMOD] Erreur envoi alerte: {e}")
+
+async def run_automod(message: discord.Message) -> bool:
+    """Analyse un message et applique les actions configurées ; retourne True si le message a été supprimé"""
+    config = automod_settings(str(message.guild.id))
+    if message.author.guild_permissions.manage_messages:
+        return False
+    # Le filtre de mots a sa propre liste : il reste actif même si l'anti-spam est coupé
+    if await run_word_filter(message, config):
+        return True
+    if not config["enabled"]:
+        return False
+
+    now = time.monotonic()
+    if config["raid"]:
+        cluster, entries = raid_detector.observe(message, config, now)
+        if entries:
+            # Traitement en tâche de fond : un raid peut demander des dizaines d'appels REST
+            task = asyncio.create_task(handle_raid(message.guild, config, cluster, entries))
+            raid_detector.tasks.add(task)
+            task.add_done_callback(raid_detector.tasks.discard)
+            return False
+
+    rules, user, channel = flood_detector.check(message, config, now)
+    if not rules:
+        return False
+
+    actions = []
+    deleted = False
+    if "delete" in config["actions"]:
+        try:
+            await message.delete()
+            deleted = True
+            actions.append("delete")
+        except discord.HTTPException:
+            pass
+
+    # Flood de salon seul : alerte uniquement (plusieurs membres, aucun coupable désigné)
+    member_rules = [rule for rule in rules if rule != "channel"]
+    state = user if member_rules else channel
+    if now - state.last_action < AUTOMOD_ACTION_COOLDOWN:
+        return deleted
+    state.last_action = now
+
+    reason = "Anti-spam : " + ", ".join(AUTOMOD_RULES[rule] for rule in rules)
+    if member_rules and "timeout" in config["actions"] and message.guild.me.top_role > message.author.top_role:
+        try:
+            timeout_until = discord.utils.utcnow() + datetime.timedelta(seconds=config["timeout"])
+            await message.author.timeout(timeout_until, reason=reason)
+            actions.append("timeout")
+            if bot.user:
+                await run_case_query(case_store.add_many, message.guild.id, bot.user.id, "mute",
+                                     [message.author.id], reason, config["timeout"])
+        except (discord.HTTPException, sqlite3.Error) as e:
+            print(f"[AUTOMOD] Erreur timeout {message.author}: {e}")
+    if "alert" in config["actions"]:
+        await send_automod_alert(message, config, rules, actions)
+    return deleted
+
+@bot.command(name="automod")
+@commands.has_permissions(manage_guild=True)
+async def automod_cmd(ctx: commands.Context, option: str = None, *values: str):
+    """Configure l'anti-spam du serveur"""
+    guild_id = str(ctx.guild.id)
+    config = automod_settings(guild_id)
+    option = (option or "").lower()
+
+    if option in ("on", "off"):
+        config["enabled"] = option == "on"
+    elif option == "actions":
+        actions = [value.lower() for value in values]
+        if not actions or any(action not in AUTOMOD_ACTIONS for action in actions):
+            return await ctx.send(embed=error_embed("Actions invalides", f"❌ Actions possibles : {', '.join(AUTOMOD_ACTIONS)}"))
+        config["actions"] = list(dict.fromkeys(actions))
+    elif option == "alert":
+        if values and values[0].lower() == "off":
+            config["alert_channel_id"] = None
+        elif ctx.message.channel_mentions:
+            config["alert_channel_id"] = ctx.message.channel_mentions[0].id
+        else:
+            return await ctx.send(embed=error_embed("Usage manquant", "❌ Utilisation : `+automod alert <#salon|off>`"))
+    elif option == "raid":
+        choice = [value.lower() for value in values]
+        if choice in (["on"], ["off"]):
+            config["raid"] = choice[0] == "on"
+        elif len(choice) == 2 and choice[0] == "action" and choice[1] in RAID_ACTIONS:
+            config["raid_action"] = choice[1]
+        else:
+            return await ctx.send(embed=error_embed(
+                "Usage manquant", f"❌ Utilisation : `+automod raid <on|off>` ou `+automod raid action <{'|'.join(RAID_ACTIONS)}>`"
+            ))
+    elif option == "set":
+        if len(values) != 2 or values[0] not in AUTOMOD_LIMITS:
+            return await ctx.send(embed=error_embed(
+                "Usage manquant", f"❌ Utilisation : `+automod set <réglage> <valeur>`\nRéglages : {', '.join(AUTOMOD_LIMITS)}"
+            ))
+        key, raw = values
+        low, high = AUTOMOD_LIMITS[key]
+        try:
+            value = type(AUTOMOD_DEFAULTS[key])(raw)
+        except ValueError:
+            value = None
+        if value is None or not low <= value <= high:
+            return await ctx.send(embed=error_embed("Valeur invalide", f"❌ `{key}` doit être entre {low} et {high}."))
+        config[key] = value
+    elif option:
+        return await ctx.send(embed=error_embed(
+            "Option inconnue", "❌ Utilisation : `+automod [on|off|actions|alert|raid|set]`"
+        ))
+
+    if option:
+        automod_config[guild_id] = config
+        save_config(automod_config, guild_id)
+
+    alert_channel = ctx.guild.get_channel(config["alert_channel_id"]) if config["alert_channel_id"] else None
+    embed = discord.Embed(
+        title="🛡️ Anti-spam",
+        description=(
+            f"**État :** {'✅ activé' if config['enabled'] else '❌ désactivé'}\n"
+            f"**Rafale :** {config['rate_messages']} messages en {config['rate_seconds']:g}s\n"
+            f"**Répétitions :** {config['duplicate_messages']} messages identiques en {config['duplicate_seconds']:g}s\n"
+            f"**Mentions :** {config['mentions']} par message\n"
+            f"**Flood du salon :** {config['channel_messages']} messages en {config['channel_seconds']:g}s\n"
+            f"**Actions :** {', '.join(config['actions']) or 'aucune'} (timeout {format_duration(config['timeout'])})\n"
+            f"**Anti-raid :** {'✅' if config['raid'] else '❌'} {config['raid_authors']} comptes en {config['raid_window']:g}s "
+            f"(similarité ≥ {config['raid_similarity']:g}), non vérifiés : {config['raid_action']}\n"
+            f"**Alertes :** {alert_channel.mention if alert_channel else 'journal du bot'}"
+        ),
+        color=discord.Color.blue()
+    )
+    await ctx.send(embed=embed)
+
+# -------------------- Filtre de mots --------------------
+# Sosies d'autres alphabets (après NFKD et casefold) et leetspeak courant
+FILTER_CONFUSABLES = {
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p", "с": "c",
+    "т": "t", "у": "y", "х": "x", "і": "i", "ј": "j", "ѕ": "s", "ԁ": "d", "ɡ": "g", "ı": "i",
+    "α": "a", "β": "b", "ε": "e", "η": "n", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p", "τ": "t",
+    "υ": "u", "χ": "x", "ω": "w",
+}
+FILTER_LEET = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "@": "a", "$": "s"})
+FILTER_INVISIBLE = "\u00ad\u200b\u200c\u200d\u2060\ufeff"
+# Une seule table pour str.translate : accents et caractères invisibles supprimés, sosies ramenés au latin
+FILTER_TABLE = str.maketrans({
+    **{char: None for char in FILTER_INVISIBLE},
+    **{chr(code): None for code in range(0x0300, 0x0370)},
+    **FILTER_CONFUSABLES,
+})
+FILTER_LETTER_PATTERN = re.compile(r"[^\W\d_]")
+FILTER_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]|_")
+# Ponctuation au milieu d'un mot (« id.iot »), sauf l'apostrophe : « he'll » ne doit pas devenir « hell »
+FILTER_INNER_PUNCTUATION_PATTERN = re.compile(r"(?<=[^\W_])[^\w\s']+(?=[^\W_])")
+FILTER_SPELLED_MIN = 3  # lettres isolées consécutives recollées (« i d i o t »)
 
-@bot.command(name="removestatus")
-@commands.has_permissions(manage_roles=True)
-async def removestatus_cmd(ctx: commands.Context, *, status_text: str = None):
-    """Retire la configuration d'un statut"""
-    if not status_text:
+word_filter_config = load_config("word_filter")
+word_filter_stats = {"checked": 0, "matched": 0}
+
+def join_spelled_letters(words: List[str]) -> List[str]:
+    """Recolle les suites d'au moins FILTER_SPELLED_MIN lettres isolées : « i d i o t » → « idiot »"""
+    joined: List[str] = []
+    run: List[str] = []
+    for word in words + [""]:
+        if len(word) == 1:
+            run.append(word)
+            continue
+        if len(run) >= FILTER_SPELLED_MIN:
+            joined.append("".join(run))
+        else:
+            joined.extend(run)
+        run = []
+        if word:
+            joined.append(word)
+    return joined
+
+def filter_forms(text: str) -> Tuple[str, str]:
+    """(ponctuation changée en espace, mots épelés ou coupés recollés) du texte normalisé
+
+    >>> filter_forms("Un MOT-interdit, i.d.1.o.t et i d i o t")
+    ('un mot interdit i d i o t et i d i o t', 'un motinterdit idiot et idiot')
+    >>> filter_forms("He'll be fine, I'll call, j'ai 455 points")
+    ('he ll be fine i ll call j ai 455 points', 'he ll be fine i ll call j ai 455 points')
+    """
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+    # Leetspeak seulement dans les mots qui contiennent des lettres : « 455 points » reste un nombre
+    words = [
+        word.translate(FILTER_LEET) if FILTER_LETTER_PATTERN.search(word) else word
+        for word in text.casefold().translate(FILTER_TABLE).split()
+    ]
+    text = " ".join(words)
+    spaced = FILTER_PUNCTUATION_PATTERN.sub(" ", text).split()
+    compact = join_spelled_letters(FILTER_PUNCTUATION_PATTERN.sub(" ", FILTER_INNER_PUNCTUATION_PATTERN.sub("", text)).split())
+    return " ".join(spaced), " ".join(compact)
+
+def normalize_filter_text(text: str) -> str:
+    """Forme comparée par le filtre : sans accents ni casse, sosies et leetspeak ramenés à l'alphabet latin"""
+    return filter_forms(text)[0]
+
+def word_filter_key(term: str) -> str:
+    """Clé stockée d'un terme : forme normalisée, `*` conservé aux extrémités (correspondance partielle)"""
+    term = term.strip()
+    prefix = "*" if term.startswith("*") else ""
+    suffix = "*" if term.endswith("*") and len(term) > 1 else ""
+    return f"{prefix}{normalize_filter_text(term.strip('*'))}{suffix}"
+
+class WordFilter:
+    """Termes interdits d'un serveur compilés en un seul automate"""
+    def __init__(self, terms: Dict[str, str]):
+        # Un espace de chaque côté impose une limite de mot, sauf du côté d'un `*`
+        self.patterns = {
+            ("" if key.startswith("*") else " ") + key.strip("*") + ("" if key.endswith("*") else " "): original
+            for key, original in terms.items() if key.strip("*")
+        }
+        self._automaton = AhoCorasick(self.patterns)
+
+    def match(self, content: Optional[str]) -> List[str]:
+        """Retourne les termes interdits présents dans le message (une passe par forme, quel que soit le nombre de termes)"""
+        if not content:
+            return []
+        spaced, compact = filter_forms(content)
+        found = [pattern for _, pattern in self._automaton.iter(f" {spaced} ")]
+        if compact != spaced:
+            found.extend(pattern for _, pattern in self._automaton.iter(f" {compact} "))
+        return list(dict.fromkeys(self.patterns[pattern] for pattern in found))
+
+word_filters: Dict[str, WordFilter] = {}
+
+def get_word_filter(guild_id: str) -> Optional[WordFilter]:
+    """Retourne l'automate du serveur, compilé à la première utilisation"""
+    word_filter = word_filters.get(guild_id)
+    if word_filter is None and word_filter_config.get(guild_id):
+        word_filter = word_filters[guild_id] = WordFilter(word_filter_config[guild_id])
+    return word_filter
+
+def invalidate_word_filter(guild_id: str):
+    """À appeler après toute modification de word_filter_config[guild_id]"""
+    word_filters.pop(guild_id, None)
+
+async def run_word_filter(message: discord.Message, config: Dict[str, Any]) -> bool:
+    """Supprime le message s'il contient un terme interdit ; retourne True si c'est le cas"""
+    word_filter = get_word_filter(str(message.guild.id))
+    if word_filter is None:
+        return False
+    word_filter_stats["checked"] += 1
+    terms = word_filter.match(message.content)
+    if not terms:
+        return False
+
+    word_filter_stats["matched"] += 1
+    AUTOMOD_DETECTIONS.inc("words")
+    actions = []
+    try:
+        await message.delete()
+        actions.append("delete")
+    except discord.HTTPException:
+        pass
+    if "alert" in config["actions"]:
+        await send_automod_alert(message, config, ["words"], actions, terms)
+    return bool(actions)
+
+@bot.command(name="addword")
+@commands.has_permissions(manage_messages=True)
+async def addword_cmd(ctx: commands.Context, *, term: str = None):
+    """Ajoute un mot ou une expression au filtre du serveur"""
+    key = word_filter_key(term) if term else ""
+    if not key.strip("*"):
         return await ctx.send(embed=error_embed(
             "Usage manquant",
-            "❌ Utilisation : `+removestatus <texte du statut>`"
+            "❌ Utilisation : `+addword <mot ou expression>`\n\n"
+            "💡 `*` en début ou fin de terme accepte la suite du mot (ex : `idiot*`)"
         ))
     
     guild_id = str(ctx.guild.id)
-    status_key = status_text.lower().strip()
-    
-    if guild_id not in status_config or status_key not in status_config[guild_id]:
-        return await ctx.send(embed=error_embed(
-            "Statut introuvable",
-            f"❌ Aucune configuration trouvée pour : **{status_text}**"
-        ))
-    
-    role_name = status_config[guild_id][status_key]["role_name"]
-    del status_config[guild_id][status_key]
+    if guild_id not in word_filter_config:
+        word_filter_config[guild_id] = {}
+    if key in word_filter_config[guild_id]:
+        return await ctx.send("⚠️ Ce terme est déjà filtré.")
     
-    if not status_config[guild_id]:
-        del status_config[guild_id]
-    
-    save_config(status_config, STATUS_CONFIG_FILE)
+    word_filter_config[guild_id][key] = term.strip()
+    invalidate_word_filter(guild_id)
+    save_config(word_filter_config, guild_id)
     
+    try:
+        await ctx.message.delete()
+    except discord.HTTPException:
+        pass
     await ctx.send(embed=embed_action(
         discord.Color.green(),
-        "Configuration Retirée",
-        f"✅ La configuration pour **{status_text}** (rôle: {role_name}) a été supprimée."
+        "Terme filtré",
+        f"✅ Les messages contenant `{key}` seront supprimés.\n\n"
+        f"💡 Accents, majuscules, leetspeak et lettres d'autres alphabets sont ramenés à cette forme."
     ))
 
-@bot.command(name="liststatus")
-async def liststatus_cmd(ctx: commands.Context):
-    """Liste tous les statuts configurés"""
+@bot.command(name="removeword")
+@commands.has_permissions(manage_messages=True)
+async def removeword_cmd(ctx: commands.Context, *, term: str = None):
+    """Retire un terme du filtre"""
+    if not term:
+        return await ctx.send(embed=error_embed("Usage manquant", "❌ Utilisation : `+removeword <mot ou expression>`"))
+    
     guild_id = str(ctx.guild.id)
+    key = word_filter_key(term)
+    if guild_id not in word_filter_config or key not in word_filter_config[guild_id]:
+        return await ctx.send(embed=error_embed("Terme introuvable", f"❌ `{key}` n'est pas filtré."))
     
-    if guild_id not in status_config or not status_config[guild_id]:
+    del word_filter_config[guild_id][key]
+    if not word_filter_config[guild_id]:
+        del word_filter_config[guild_id]
+    
+    invalidate_word_filter(guild_id)
+    save_config(word_filter_config, guild_id)
+    await ctx.send(embed=embed_action(discord.Color.green(), "Terme retiré", f"✅ `{key}` n'est plus filtré."))
+
+@bot.command(name="listwords")
+@commands.has_permissions(manage_messages=True)
+async def listwords_cmd(ctx: commands.Context):
+    """Liste les termes filtrés du serveur"""
+    terms = word_filter_config.get(str(ctx.guild.id))
+    if not terms:
         return await ctx.send(embed=error_embed(
             "Aucune configuration",
-            "❌ Aucun statut n'est configuré.\n\nUtilise `+setstatus <@role> <texte>` pour en créer un."
+            "❌ Aucun terme n'est filtré.\n\nUtilise `+addword <texte>` pour en ajouter un."
         ))
     
-    embed = discord.Embed(title="🌟 Statuts Configurés", color=discord.Color.purple())
+    listing = "\n".join(f"• ||{key}||" for key in sorted(terms))
+    if len(listing) > 4000:
+        listing = listing[:4000].rsplit("\n", 1)[0] + "\n…"
+    embed = discord.Embed(title=f"🚫 Termes filtrés ({len(terms)})", description=listing, color=discord.Color.red())
+    embed.set_footer(text="Forme normalisée : sans accents ni majuscules, leetspeak converti")
+    await ctx.send(embed=embed)
+
+# -------------------- Statistiques --------------------
+@bot.command(name="botstats")
+@commands.has_permissions(administrator=True)
+async def botstats_cmd(ctx: commands.Context):
+    """Affiche les compteurs internes du bot"""
+    embed = discord.Embed(title="📈 Statistiques internes", color=discord.Color.blue())
     
-    for status_text, config in status_config[guild_id].items():
-        role = ctx.guild.get_role(config["role_id"])
-        role_mention = role.mention if role else f"~~{config['role_name']}~~ (rôle supprimé)"
+    presence = presence_coalescer.stats
+    embed.add_field(
+        name="🌟 Présences",
+        value=(
+            f"Reçues : {presence['received']}\n"
+            f"Regroupées : {presence['coalesced']}\n"
+            f"Ignorées (sans effet) : {presence['dropped_noop']}\n"
+            f"Traitées : {presence['processed']}\n"
+            f"En attente : {presence_coalescer.pending}\n"
+            f"Fenêtre : {presence_coalescer.window:g}s"
+        ),
+        inline=True
+    )
+    
+    writer = config_writer.stats
+    embed.add_field(
+        name="💾 Persistance",
+        value=(
+            f"Modifications : {writer['marked']}\n"
+            f"Lignes écrites : {writer['rows_written']}\n"
+            f"Écritures groupées : {writer['flushes']}\n"
+            f"En attente : {config_writer.pending}"
+        ),
+        inline=True
+    )
+    
+    cache = user_cache.stats
+    lookups = cache["hits"] + cache["negative_hits"] + cache["misses"] + cache["coalesced"]
+    hit_rate = (cache["hits"] + cache["negative_hits"] + cache["coalesced"]) / lookups * 100 if lookups else 0.0
+    embed.add_field(
+        name="👤 Cache utilisateurs",
+        value=(
+            f"Succès : {cache['hits']} (+{cache['negative_hits']} négatifs)\n"
+            f"Échecs : {cache['misses']}\n"
+            f"Fusionnées : {cache['coalesced']}\n"
+            f"Taux : {hit_rate:.1f}%\n"
+            f"Entrées : {len(user_cache)}/{user_cache.maxsize}"
+        ),
+        inline=True
+    )
+    
+    if join_pipelines:
+        joins = sum(p.stats["joins"] for p in join_pipelines.values())
+        batched = sum(p.stats["batched"] for p in join_pipelines.values())
+        batch_messages = sum(p.stats["batch_messages"] for p in join_pipelines.values())
+        bursts = sum(1 for p in join_pipelines.values() if p.burst)
         embed.add_field(
-            name=f"📝 {config['original_text']}", 
-            value=f"→ {role_mention}",
-            inline=False
+            name="🚪 Arrivées",
+            value=(
+                f"Total : {joins}\n"
+                f"Accueil groupé : {batched} membre(s) en {batch_messages} message(s)\n"
+                f"Serveurs en vague : {bursts}"
+            ),
+            inline=True
         )
     
-    embed.set_footer(text="Les membres avec ces textes dans leur statut recevront le rôle correspondant")
-    await ctx.send(embed=embed)
-
-# -------------------- Commandes de modération --------------------
-@bot.command(name="clear")
-@commands.has_permissions(manage_messages=True)
-async def clear_cmd(ctx: commands.Context, amount: int = 5):
-    """Supprime des messages"""
-    if amount < 1 or amount > 100:
-        return await ctx.send(embed=error_embed("Valeur invalide", "Le nombre doit être entre 1 et 100."))
-    deleted = await ctx.channel.purge(limit=amount + 1)
-    await ctx.send(embed=embed_action(discord.Color.blue(), "Clear", f"🧹 {len(deleted) - 1} messages supprimés."), delete_after=5)
-
-@bot.command(name="kick")
-@commands.has_permissions(kick_members=True)
-async def kick_cmd(ctx: commands.Context, *, user: str = None):
-    """Expulse un membre"""
-    if not user:
-        return await ctx.send(embed=error_embed("Usage manquant", "❌ Utilisation : `+kick <user|id|@mention>`"))
-    target = await fetch_user_or_member(ctx, user)
-    if not target or not isinstance(target, discord.Member):
-        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Membre introuvable."))
-    try:
-        await target.kick(reason=f"Kick par {ctx.author}")
-        await ctx.send(embed=embed_action(discord.Color.orange(), "Expulsion", f"👢 {target.mention} a été expulsé !"))
-    except Exception as e:
-        await ctx.send(embed=error_embed("Erreur", "Impossible d'expulser cet utilisateur."))
-
-@bot.command(name="ban")
-@commands.has_permissions(ban_members=True)
-async def ban_cmd(ctx: commands.Context, *, user: str = None):
-    """Bannit un utilisateur"""
-    if not user:
-        return await ctx.send(embed=error_embed("Usage manquant", "❌ Utilisation : `+ban <user|id|@mention>`"))
-    target = await fetch_user_or_member(ctx, user)
-    if not target:
-        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Utilisateur introuvable."))
-    try:
-        if isinstance(target, discord.Member):
-            await target.ban(reason=f"Ban par {ctx.author}", delete_message_days=0)
-        else:
-            await ctx.guild.ban(discord.Object(id=int(target.id)), reason=f"Ban par {ctx.author}")
-        await ctx.send(embed=embed_action(discord.Color.red(), "Bannissement", f"⛔ {target.mention if isinstance(target, discord.Member) else target} a été banni !"))
-    except Exception as e:
-        await ctx.send(embed=error_embed("Erreur", "Impossible de bannir cet utilisateur."))
-
-@bot.command(name="unban")
-@commands.has_permissions(ban_members=True)
-async def unban_cmd(ctx: commands.Context, user_id: str = None):
-    """Débannit un utilisateur"""
-    if not user_id or not user_id.isdigit():
-        return await ctx.send(embed=error_embed("ID invalide", "❌ Utilisation : `+unban <user_id>`"))
-    try:
-        user = await bot.fetch_user(int(user_id))
-        await ctx.guild.unban(user, reason=f"Unban par {ctx.author}")
-        await ctx.send(embed=embed_action(discord.Color.green(), "Débannissement", f"✅ {user} a été débanni."))
-    except Exception as e:
-        await ctx.send(embed=error_embed("Erreur", "Impossible de débannir (ID invalide ou pas banni)."))
-
-@bot.command(name="mute")
-@commands.has_permissions(moderate_members=True)
-async def mute_cmd(ctx: commands.Context, user: str = None, duration: str = None):
-    """Met un membre en timeout"""
-    if not user or not duration:
-        return await ctx.send(embed=error_embed(
-            "Usage manquant",
-            "❌ Utilisation : `+mute <user|id|@mention> <durée>`\n"
-            "Exemple : 10m, 1h, 2d\n⚠️ Max: 28 jours"
-        ))
+    memory = memory_report()
+    ready = startup_stats.get("ready")
+    members_ready = startup_stats.get("members_ready")
+    embed.add_field(
+        name="🧠 Mémoire",
+        value=(
+            f"Résidente : {memory['rss_mib']} Mio\n"
+            f"Membres en cache : {memory['cached_members']}\n"
+            f"Serveurs chargés : {memory['chunked_guilds']}/{memory['guilds']}\n"
+            f"Par 10k membres : {memory['rss_mib_per_10k_members']} Mio\n"
+            f"Prêt en : {f'{ready:.1f}s' if ready is not None else '-'}"
+            f" (membres : {f'{members_ready:.1f}s' if members_ready is not None else '-'})"
+        ),
+        inline=True
+    )
     
-    seconds = parse_duration(duration)
-    if seconds is None or seconds <= 0 or seconds > 28 * 86400:
-        return await ctx.send(embed=error_embed(
-            "Durée invalide",
-            "❌ Exemple : 30s, 10m, 1h, 2d\n⚠️ Maximum : 28 jours"
-        ))
+    if bot.shard_count:
+        latencies = getattr(bot, "latencies", [])
+        embed.add_field(
+            name="🧩 Shards",
+            value=(
+                f"Processus : {CLUSTER_ID}\n"
+                f"Shards : {format_shard_ids(shard_id for shard_id, _ in latencies)} / {bot.shard_count}\n"
+                f"Ce serveur : shard {ctx.guild.shard_id}"
+            ),
+            inline=True
+        )
     
-    target = await fetch_user_or_member(ctx, user)
-    if not target or not isinstance(target, discord.Member):
-        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Membre introuvable."))
+    flood = flood_detector.stats
+    embed.add_field(
+        name="🛡️ Anti-spam",
+        value=(
+            f"Messages analysés : {flood['messages']}\n"
+            f"Détections : {flood['detections']}\n"
+            f"Suivis : {len(flood_detector.users)} membre(s), {len(flood_detector.channels)} salon(s)\n"
+            f"Évincés (LRU) : {flood['evicted']}\n"
+            f"Raids détectés : {raid_detector.stats['clusters_flagged']}\n"
+            f"Mots filtrés : {word_filter_stats['matched']}/{word_filter_stats['checked']} "
+            f"({len(word_filters)} automate(s) en cache)"
+        ),
+        inline=True
+    )
     
-    timeout_until = discord.utils.utcnow() + datetime.timedelta(seconds=seconds)
+    scheduled = action_scheduler.stats
+    embed.add_field(
+        name="⏰ Actions planifiées",
+        value=(
+            f"En attente : {await action_scheduler.pending()} ({action_scheduler.in_memory} en mémoire)\n"
+            f"Exécutées : {scheduled['done']} (+{scheduled['noop']} sans effet)\n"
+            f"Nouvelles tentatives : {scheduled['retried']} (+{scheduled['deferred']} serveur indisponible)\n"
+            f"Échecs : {scheduled['failed']}\n"
+            f"Annulées : {scheduled['cancelled']}"
+        ),
+        inline=True
+    )
     
-    try:
-        await target.timeout(timeout_until, reason=f"Mute par {ctx.author}")
-        
-        try:
-            await target.send(f"🔇 Tu as été mis en timeout sur **{ctx.guild.name}** pour {duration}.")
-        except:
-            pass
-        
-        await ctx.send(embed=embed_action(
-            discord.Color.dark_magenta(),
-            "Timeout",
-            f"🔇 {target.mention} a été mis en timeout pour {duration}."
-        ))
-    except Exception as e:
-        await ctx.send(embed=error_embed("Erreur", "Impossible de mute cet utilisateur."))
-
-@bot.command(name="unmute")
-@commands.has_permissions(moderate_members=True)
-async def unmute_cmd(ctx: commands.Context, *, user: str = None):
-    """Retire le timeout d'un membre"""
-    if not user:
-        return await ctx.send(embed=error_embed("Usage manquant", "❌ Utilisation : `+unmute <user|id|@mention>`"))
+    if status_sweep_job is not None:
+        embed.add_field(
+            name="🔄 Synchronisation des statuts",
+            value=f"{status_sweep_job.progress_text()}\n{status_sweep_job.succeeded} rôle(s) appliqué(s)",
+            inline=True
+        )
     
-    target = await fetch_user_or_member(ctx, user)
-    if not target or not isinstance(target, discord.Member):
-        return await ctx.send(embed=error_embed("Utilisateur introuvable", "❌ Membre introuvable."))
+    embed.timestamp = datetime.datetime.now()
+    await ctx.send(embed=embed)
+
+@bot.command(name="trace")
+@commands.is_owner()
+async def trace_cmd(ctx: commands.Context, threshold: str = None):
+    """Règle le seuil de journalisation des handlers lents"""
+    global SLOW_HANDLER_THRESHOLD
+    if threshold is None:
+        state = f"{SLOW_HANDLER_THRESHOLD * 1000:.0f} ms" if SLOW_HANDLER_THRESHOLD > 0 else "désactivé"
+        return await ctx.send(f"🐢 Seuil des handlers lents : **{state}**\nUtilisation : `+trace <ms|off>`")
+    if threshold.lower() == "off":
+        SLOW_HANDLER_THRESHOLD = 0
+    elif threshold.isdigit():
+        SLOW_HANDLER_THRESHOLD = int(threshold) / 1000
+    else:
+        return await ctx.send(embed=error_embed("Valeur invalide", "❌ Utilisation : `+trace <ms|off>`"))
+    if SLOW_HANDLER_THRESHOLD > 0:
+        description = f"🐢 Handlers lents journalisés au-delà de **{threshold} ms**."
+    else:
+        description = "🐢 Journalisation des handlers lents désactivée."
+    await ctx.send(embed=embed_action(discord.Color.blue(), "Traçage", description))
+
+@bot.command(name="profiler")
+@commands.is_owner()
+async def profiler_cmd(ctx: commands.Context, action: str = None, hz: int = 100):
+    """Démarre ou arrête le profileur par échantillonnage"""
+    if action == "start":
+        if profiler.running:
+            return await ctx.send(embed=error_embed("Déjà actif", "❌ Le profileur tourne déjà. Utilise `+profiler stop`."))
+        hz = max(1, min(hz, 1000))
+        profiler.start(hz, threading.get_ident())
+        return await ctx.send(embed=embed_action(discord.Color.blue(), "Profileur", f"🔬 Échantillonnage démarré à {hz} Hz."))
     
-    if target.timed_out_until is None:
-        return await ctx.send(embed=error_embed("Non mute", "❌ Cet utilisateur n'est pas en timeout."))
+    if action == "stop":
+        if not profiler.running:
+            return await ctx.send(embed=error_embed("Inactif", "❌ Le profileur n'est pas démarré."))
+        samples, path = await asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+        file = discord.File(path) if os.path.getsize(path) < 8 * 1024 * 1024 else None
+        description = f"🔬 {samples} échantillon(s) écrits dans `{path}` (format folded, compatible flamegraph.pl / speedscope)."
+        if file:
+            return await ctx.send(embed=embed_action(discord.Color.blue(), "Profileur arrêté", description), file=file)
+        return await ctx.send(embed=embed_action(discord.Color.blue(), "Profileur arrêté", description))
     
-    try:
-        await target.timeout(None, reason=f"Unmute par {ctx.author}")
-        
-        try:
-            await target.send(f"✅ Ton timeout sur **{ctx.guild.name}** a été levé !")
-        except:
-            pass
-        
-        await ctx.send(embed=embed_action(discord.Color.green(), "Unmute", f"🔊 {target.mention} a été unmute !"))
-    except Exception as e:
-        await ctx.send(embed=error_embed("Erreur", "Impossible d'unmute cet utilisateur."))
+    state = f"actif ({profiler.hz} Hz)" if profiler.running else "inactif"
+    await ctx.send(f"🔬 Profileur : **{state}**\nUtilisation : `+profiler start [hz]` / `+profiler stop`")
 
 # -------------------- Commande d'aide --------------------
 @bot.command(name="help")
@@ -712,7 +4452,7 @@ async def help_cmd(ctx: commands.Context):
     embed.add_field(
         name="⚙️ Configuration",
         value=(
-            "`+setupverification` - Configure le système de vérification complet\n"
+            "`+setupverification [preview]` - Configure le système de vérification complet\n"
             "`+configverif unverified <@role>` - Définir le rôle non vérifié\n"
             "`+configverif verified <@role>` - Ajouter un rôle vérifié"
         ),
@@ -724,6 +4464,7 @@ async def help_cmd(ctx: commands.Context):
         value=(
             "`+setstatus <@role> <texte>` - Donne un rôle selon le statut\n"
             "`+removestatus <texte>` - Retire une config de statut\n"
+            "`+cancelbackfill [texte]` - Annule l'application d'un statut en cours\n"
             "`+liststatus` - Voir les statuts configurés"
         ),
         inline=False
@@ -731,7 +4472,11 @@ async def help_cmd(ctx: commands.Context):
     
     embed.add_field(
         name="🧹 Modération Messages",
-        value="`+clear [nombre]` - Supprimer des messages (1-100)",
+        value=(
+            "`+clear [nombre] [filtres]` - Supprimer des messages\n"
+            "Filtres : `user:@membre` `bots` `attachments` `regex:\"texte\"` `after:1h` `before:2d`\n"
+            "`+clearstop` - Annuler le clear en cours"
+        ),
         inline=False
     )
     
@@ -740,7 +4485,53 @@ async def help_cmd(ctx: commands.Context):
         value=(
             "`+kick <user>` - Expulser un membre\n"
             "`+ban <user>` - Bannir un utilisateur\n"
-            "`+unban <user_id>` - Débannir un utilisateur"
+            "`+tempban <user> <durée> [raison]` - Bannir temporairement\n"
+            "`+unban <user_id>` - Débannir un utilisateur\n"
+            "`+temprole <user> <@role> <durée>` - Rôle retiré automatiquement\n"
+            "`+warn <user> [raison]` - Avertir un membre"
+        ),
+        inline=False
+    )
+    
+    embed.add_field(
+        name="📁 Historique des sanctions",
+        value=(
+            "`+cases [user]` - Sanctions d'un membre (ou du serveur)\n"
+            "`+cases mod <user>` - Sanctions données par un modérateur\n"
+            "`+case <numéro>` - Détail d'une sanction"
+        ),
+        inline=False
+    )
+    
+    embed.add_field(
+        name="🛡️ Anti-spam",
+        value=(
+            "`+automod [on|off]` - Voir / activer l'anti-spam\n"
+            "`+automod actions <delete|timeout|alert...>` - Actions en cas de spam\n"
+            "`+automod alert <#salon|off>` - Salon des alertes\n"
+            "`+automod raid <on|off>` / `+automod raid action <kick|ban|timeout>` - Anti-raid multi-comptes\n"
+            "`+automod set <réglage> <valeur>` - Seuils (rafale, répétitions, mentions...)"
+        ),
+        inline=False
+    )
+    
+    embed.add_field(
+        name="🚫 Filtre de mots",
+        value=(
+            "`+addword <texte>` - Supprimer les messages contenant ce terme (`*` = partiel)\n"
+            "`+removeword <texte>` - Retirer un terme\n"
+            "`+listwords` - Voir les termes filtrés"
+        ),
+        inline=False
+    )
+    
+    embed.add_field(
+        name="🚨 Modération groupée",
+        value=(
+            "`+massban <ids...> [| raison]` - Bannir plusieurs utilisateurs\n"
+            "`+masskick <ids...> [| raison]` - Expulser plusieurs membres\n"
+            "`+massmute <durée> <ids...> [| raison]` - Timeout de plusieurs membres\n"
+            "💡 Mentions, IDs ou fichier .txt d'IDs joint"
         ),
         inline=False
     )
@@ -748,7 +4539,7 @@ async def help_cmd(ctx: commands.Context):
     embed.add_field(
         name="🔇 Timeout",
         value=(
-            "`+mute <user> <durée>` - Timeout temporaire (ex: 10m, 1h)\n"
+            "`+mute <user> <durée>` - Timeout temporaire (ex: 10m, 1h ; rôle Muted au-delà de 28j)\n"
             "`+unmute <user>` - Annuler un timeout"
         ),
         inline=False
@@ -758,6 +4549,8 @@ async def help_cmd(ctx: commands.Context):
         name="📝 Informations",
         value=(
             "`+setbio` - Info sur la modification de la bio du bot\n"
+            "`+botstats` - Compteurs internes du bot\n"
+            "`+trace <ms|off>` / `+profiler start|stop` - Diagnostic des lenteurs (propriétaire)\n"
             "`+help` - Affiche cette aide"
         ),
         inline=False
@@ -788,6 +4581,7 @@ async def setbio_cmd(ctx: commands.Context):
 
 # -------------------- Événements du bot --------------------
 @bot.event
+@instrumented_event
 async def on_ready():
     """Événement de connexion du bot"""
     await bot.change_presence(
@@ -796,22 +4590,119 @@ async def on_ready():
     )
     print(f"[BOT] ✅ Connecté en tant que {bot.user} ({bot.user.id})")
     print(f"[BOT] 📊 Présent sur {len(bot.guilds)} serveur(s)")
+    if bot.shard_count:
+        shard_ids = format_shard_ids(getattr(bot, "shard_ids", None) or range(bot.shard_count))
+        print(f"[BOT] 🧩 Shards {shard_ids} sur {bot.shard_count} (processus {CLUSTER_ID})")
     
-    # Applique les rôles de statut aux membres existants
-    for guild in bot.guilds:
-        guild_id = str(guild.id)
-        if guild_id in status_config:
-            print(f"[STATUS] 🔍 Vérification des statuts pour {guild.name}...")
-            for member in guild.members:
-                await check_and_apply_status_role(member)
+    startup_stats.setdefault("ready", time.monotonic() - PROCESS_STARTED)
+    print(f"[BOT] ⏱️ Prêt en {startup_stats['ready']:.1f}s")
     
-    # Enregistre les boutons persistants
-    bot.add_view(VerifyButton(0))  # user_id=0 sera remplacé par l'ID réel
-    print("[BOT] ✅ Boutons de vérification enregistrés")
+    # Charge les membres utiles puis applique les rôles de statut (en arrière-plan, une seule fois)
+    start_startup_chunking()
+    
+    # Reprend les actions planifiées (celles échues pendant l'arrêt sont exécutées tout de suite)
+    action_scheduler.start()
+
+@instrumented_event
+async def on_message_automod(message: discord.Message) -> bool:
+    """Anti-spam d'un message ; retourne True s'il a été supprimé"""
+    if message.guild is None or not isinstance(message.author, discord.Member) or message.author.bot:
+        return False
+    return await run_automod(message)
+
+@bot.event
+async def on_message(message: discord.Message):
+    """Anti-spam, puis traitement des commandes (hors de la mesure : une commande peut durer des minutes)"""
+    if await on_message_automod(message):
+        return
+    await bot.process_commands(message)
+
+@bot.event
+@instrumented_event
+async def on_raw_message_edit(payload: discord.RawMessageUpdateEvent):
+    """Filtre de mots sur les messages modifiés, même absents du cache (sinon il suffirait d'éditer pour le contourner)"""
+    data = payload.data
+    if payload.guild_id is None or "content" not in data or data.get("author", {}).get("bot"):
+        return
+    word_filter = get_word_filter(str(payload.guild_id))
+    # Vérification sur le texte brut d'abord : le message n'est récupéré (appel REST) que s'il contient un terme
+    if word_filter is None or not word_filter.match(data["content"]):
+        return
+    guild = bot.get_guild(payload.guild_id)
+    channel = guild.get_channel_or_thread(payload.channel_id) if guild else None
+    if channel is None:
+        return
+    try:
+        message = await channel.fetch_message(payload.message_id)
+    except discord.HTTPException:
+        return
+    if not isinstance(message.author, discord.Member) or message.author.guild_permissions.manage_messages:
+        return
+    await run_word_filter(message, automod_settings(str(payload.guild_id)))
+
+@bot.event
+@instrumented_event
+async def on_member_remove(member: discord.Member):
+    """Met à jour les index quand un membre quitte le serveur"""
+    index = member_name_indexes.get(member.guild.id)
+    if index:
+        index.remove(member.id)
+    presence_coalescer.forget(member.guild.id, member.id)
+
+@bot.event
+@instrumented_event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    """Met à jour l'index des noms (changement de pseudo)"""
+    if before.display_name != after.display_name:
+        index = member_name_indexes.get(after.guild.id)
+        if index:
+            index.add(after)
 
 @bot.event
+@instrumented_event
+async def on_user_update(before: discord.User, after: discord.User):
+    """Met à jour l'index des noms (changement de nom d'utilisateur)"""
+    if before.name == after.name and before.global_name == after.global_name:
+        return
+    for guild in after.mutual_guilds:
+        index = member_name_indexes.get(guild.id)
+        member = guild.get_member(after.id)
+        if index and member:
+            index.add(member)
+
+@bot.before_invoke
+async def start_command_timer(ctx: commands.Context):
+    ctx.metrics_started = time.perf_counter()
+    ctx.trace = Trace(f"commande {ctx.command.qualified_name}")
+    ctx.trace_token = current_trace.set(ctx.trace)
+    # Serveurs non chargés au démarrage : membres chargés à la première commande
+    if ctx.guild is not None and not ctx.guild.chunked:
+        await ensure_chunked(ctx.guild)
+
+@bot.after_invoke
+async def record_command_metrics(ctx: commands.Context):
+    """Compte chaque commande exécutée et mesure sa durée"""
+    name = ctx.command.qualified_name
+    COMMANDS_TOTAL.inc(name, "error" if ctx.command_failed else "ok")
+    COMMAND_DURATION.observe(time.perf_counter() - ctx.metrics_started, name)
+    current_trace.reset(ctx.trace_token)
+    ctx.trace.finish()
+
+@bot.event
+@instrumented_event
 async def on_command_error(ctx: commands.Context, error):
     """Gestion des erreurs de commandes"""
+    if ctx.command is not None and not hasattr(ctx, "metrics_started"):
+        # Refusée avant exécution (permissions, arguments...)
+        COMMANDS_TOTAL.inc(ctx.command.qualified_name, "rejected")
+    if isinstance(error, AmbiguousMember):
+        candidates = "\n".join(f"• {member.mention} — `{member}` (`{member.id}`)" for member in error.members[:10])
+        if len(error.members) > 10:
+            candidates += "\n…"
+        return await ctx.send(embed=error_embed(
+            "Plusieurs membres trouvés",
+            f"❌ Plusieurs membres correspondent à **{error.query}** :\n{candidates}\n\nUtilise une mention ou un ID."
+        ))
     if isinstance(error, commands.CommandNotFound):
         return
     if isinstance(error, commands.MissingRequiredArgument):
@@ -850,6 +4741,13 @@ if __name__ == "__main__":
     print("🚀 Démarrage du bot...")
     print("=" * 60)
     
+    # --cluster N (ou CLUSTER_PROCESSES=N) : ce processus devient le lanceur de N processus shardés
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cluster", type=int, default=env_int("CLUSTER_PROCESSES", 0))
+    args, _ = parser.parse_known_args()
+    if args.cluster > 0:
+        sys.exit(run_cluster(TOKEN, args.cluster))
+    
     try:
         bot.run(TOKEN)
     except discord.LoginFailure:
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# bench_hoshikuzu.py
+# Benchmarks hors ligne du bot Hoshikuzu : serveurs synthétiques, faux objets Discord, couche HTTP locale
+# Usage : python bench_hoshikuzu.py [--sizes 1000,10000,100000] [--rules 10,100,500] [--json out.json] [--compare base.json]
+
+import os, sys, json, time, random, asyncio, argparse, tempfile, tracemalloc, contextlib
+from collections import Counter
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+# Base SQLite jetable et pas de journalisation des handlers lents pendant les mesures
+os.environ.setdefault("HOSHIKUZU_DB", os.path.join(tempfile.mkdtemp(prefix="hoshikuzu-bench-"), "bench.db"))
+os.environ.setdefault("SLOW_HANDLER_THRESHOLD", "0")
+
+import discord
+import Hoshikuzu_moderation as hoshikuzu
+
+# -------------------- Faux objets Discord --------------------
+class FakeHTTP:
+    """Couche HTTP locale : compte les appels par route et simule une latence"""
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter = Counter()
+
+    async def call(self, route: str):
+        self.calls[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str):
+        self.id = role_id
+        self.name = name
+        self.mention = f"<@&{role_id}>"
+
+class FakeAsset:
+    url = "https://cdn.discordapp.com/embed/avatars/0.png"
+
+class FakeChannel:
+    def __init__(self, channel_id: int, http: FakeHTTP):
+        self.id = channel_id
+        self.name = "✅・vérification"
+        self._http = http
+
+    async def send(self, content=None, embed=None, view=None, **kwargs):
+        await self._http.call("POST /channels/{channel_id}/messages")
+
+class FakeMember:
+    bot = False
+    display_avatar = FakeAsset()
+
+    def __init__(self, guild: "FakeGuild", member_id: int, name: str, display_name: str, status: Optional[str]):
+        self.guild = guild
+        self.id = member_id
+        self.name = name
+        self.display_name = display_name
+        self.global_name = None
+        self.mention = f"<@{member_id}>"
+        self.roles: List[FakeRole] = [guild.default_role]
+        self.activities = [discord.CustomActivity(name=status)] if status else []
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        for role in self.roles:
+            if role.id == role_id:
+                return role
+        return None
+
+    async def edit(self, *, roles, reason=None):
+        await self.guild.http.call("PATCH /guilds/{guild_id}/members/{user_id}")
+        self.roles = [self.guild.default_role] + list(roles)
+
+    async def add_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.guild.http.call("PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}")
+            self.roles.append(role)
+
+class FakeGuild:
+    def __init__(self, guild_id: int, http: FakeHTTP):
+        self.id = guild_id
+        self.name = f"bench-{guild_id}"
+        self.http = http
+        self.default_role = FakeRole(guild_id, "@everyone")
+        self.roles: Dict[int, FakeRole] = {}
+        self.channels: Dict[int, FakeChannel] = {}
+        self._members: Dict[int, FakeMember] = {}
+
+    @property
+    def members(self) -> List[FakeMember]:
+        return list(self._members.values())
+
+    def add_member(self, member: FakeMember):
+        self._members[member.id] = member
+
+    def get_member(self, member_id: int) -> Optional[FakeMember]:
+        return self._members.get(member_id)
+
+    def get_role(self, role_id: Optional[int]) -> Optional[FakeRole]:
+        return self.roles.get(role_id)
+
+    def get_channel(self, channel_id: Optional[int]) -> Optional[FakeChannel]:
+        return self.channels.get(channel_id)
+
+class FakeContext:
+    def __init__(self, guild: FakeGuild):
+        self.guild = guild
+
+class FakeBot:
+    def __init__(self, guilds: List[FakeGuild]):
+        self.guilds = guilds
+
+    def get_user(self, user_id: int):
+        return None
+
+# -------------------- Serveurs synthétiques --------------------
+WORDS = ["hoshi", "kuzu", "star", "night", "moon", "raid", "dev", "art", "music", "game", "luna", "nova"]
+
+def build_guild(members: int, rules: int, rng: random.Random, match_ratio: float = 0.3, latency: float = 0.0) -> FakeGuild:
+    """Serveur avec `members` membres, `rules` règles de statut et ~match_ratio de statuts correspondants"""
+    guild_id = 10 ** 17 + rng.randrange(10 ** 16)
+    guild = FakeGuild(guild_id, FakeHTTP(latency))
+
+    rule_keys = [f"/{rng.choice(WORDS)}{index}" for index in range(rules)]
+    status_rules = {}
+    for index, key in enumerate(rule_keys):
+        role = FakeRole(guild_id + 1000 + index, f"status-{index}")
+        guild.roles[role.id] = role
+        status_rules[key] = {"role_id": role.id, "role_name": role.name, "original_text": key}
+
+    unverified = FakeRole(guild_id + 1, "En Attente de Vérification")
+    guild.roles[unverified.id] = unverified
+    channel = FakeChannel(guild_id + 2, guild.http)
+    guild.channels[channel.id] = channel
+
+    for index in range(members):
+        if rule_keys and rng.random() < match_ratio:
+            status = f"{rng.choice(WORDS)} {rng.choice(rule_keys)} {rng.choice(WORDS)}"
+        elif rng.random() < 0.5:
+            status = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 6)))
+        else:
+            status = None
+        name = f"user{index}"
+        display_name = f"{rng.choice(WORDS).title()}{index}"
+        guild.add_member(FakeMember(guild, guild_id + 10 ** 6 + index, name, display_name, status))
+
+    hoshikuzu.status_config[str(guild_id)] = status_rules
+    hoshikuzu.invalidate_status_matcher(str(guild_id))
+    hoshikuzu.verification_config[str(guild_id)] = {
+        "verification_channel_id": channel.id,
+        "unverified_role_id": unverified.id,
+        "verified_role_ids": [],
+    }
+    return guild
+
+def reset_runtime_state():
+    """Remet à zéro les caches et files du bot entre deux mesures"""
+    hoshikuzu.member_name_indexes.clear()
+    hoshikuzu.member_edit_limiters.clear()
+    hoshikuzu.member_role_states.clear()
+    hoshikuzu.join_pipelines.clear()
+    hoshikuzu.status_matchers.clear()
+    hoshikuzu.status_sweep_job = None
+
+# -------------------- Scénarios --------------------
+async def scenario_status_reconcile(guild: FakeGuild) -> int:
+    for member in guild.members:
+        await hoshikuzu.check_and_apply_status_role(member)
+    return len(guild.members)
+
+async def scenario_name_resolution(guild: FakeGuild, lookups: int, rng: random.Random) -> int:
+    ctx = FakeContext(guild)
+    members = guild.members
+    for _ in range(lookups):
+        member = rng.choice(members)
+        query = rng.choice((member.name, member.display_name, member.name.upper()))
+        try:
+            await hoshikuzu.fetch_user_or_member(ctx, query)
+        except hoshikuzu.AmbiguousMember:
+            pass
+    return lookups
+
+async def scenario_member_join(guild: FakeGuild) -> int:
+    joiners = guild.members
+    for member in joiners:
+        await hoshikuzu.on_member_join(member)
+    # Attend la vidange des lots d'accueil (mode raid)
+    pipeline = hoshikuzu.join_pipelines.get(guild.id)
+    while pipeline and pipeline.pending:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    return len(joiners)
+
+async def scenario_ready_sweep(guild: FakeGuild) -> int:
+    original_bot = hoshikuzu.bot
+    hoshikuzu.bot = FakeBot([guild])
+    try:
+        job = hoshikuzu.start_status_sweep()
+        await job.task
+        return job.done
+    finally:
+        hoshikuzu.bot = original_bot
+
+# -------------------- Mesure --------------------
+def measure(name: str, params: Dict[str, Any], build: Callable[[], FakeGuild],
+            run: Callable[[FakeGuild], Awaitable[int]], with_memory: bool) -> Dict[str, Any]:
+    """Exécute le scénario sur un serveur neuf : une passe chronométrée, puis une passe tracemalloc"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        reset_runtime_state()
+        guild = build()
+        start = time.perf_counter()
+        ops = asyncio.run(run(guild))
+        elapsed = time.perf_counter() - start
+        http_calls = dict(guild.http.calls)
+
+        peak_kib = None
+        if with_memory:
+            reset_runtime_state()
+            guild = build()
+            tracemalloc.start()
+            asyncio.run(run(guild))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak_kib = round(peak / 1024, 1)
+
+    return {
+        "name": name,
+        "params": params,
+        "ops": ops,
+        "seconds": round(elapsed, 6),
+        "ops_per_sec": round(ops / elapsed, 1) if elapsed > 0 else None,
+        "peak_kib": peak_kib,
+        "http_calls": http_calls,
+    }
+
+def run_suite(sizes: List[int], rule_counts: List[int], seed: int, with_memory: bool) -> List[Dict[str, Any]]:
+    results = []
+    # Pas de limitation de débit : on mesure le coût du code, pas les quotas Discord
+    hoshikuzu.MEMBER_EDIT_RATE = 10 ** 9
+    hoshikuzu.JOIN_BATCH_INTERVAL = 0.0
+
+    def guild_factory(members: int, rules: int) -> Callable[[], FakeGuild]:
+        return lambda: build_guild(members, rules, random.Random(seed))
+
+    for size in sizes:
+        for rules in rule_counts:
+            params = {"members": size, "rules": rules}
+            results.append(measure("status_reconcile", params, guild_factory(size, rules), scenario_status_reconcile, with_memory))
+            print_result(results[-1])
+            results.append(measure("ready_sweep", params, guild_factory(size, rules), scenario_ready_sweep, with_memory))
+            print_result(results[-1])
+
+        lookups = min(size, 10000)
+        params = {"members": size, "lookups": lookups}
+        results.append(measure(
+            "name_resolution", params, guild_factory(size, 0),
+            lambda guild: scenario_name_resolution(guild, lookups, random.Random(seed)), with_memory
+        ))
+        print_result(results[-1])
+
+        for mode, threshold in (("normal", 10 ** 9), ("raid", 1)):
+            hoshikuzu.JOIN_BURST_THRESHOLD = threshold
+            results.append(measure(f"member_join_{mode}", {"members": size}, guild_factory(size, 0), scenario_member_join, with_memory))
+            print_result(results[-1])
+    return results
+
+# -------------------- Rapport --------------------
+def result_key(result: Dict[str, Any]) -> str:
+    params = " ".join(f"{key}={value}" for key, value in sorted(result["params"].items()))
+    return f"{result['name']} {params}"
+
+def print_result(result: Dict[str, Any]):
+    http = sum(result["http_calls"].values())
+    peak = f"{result['peak_kib']:>10.1f}" if result["peak_kib"] is not None else f"{'-':>10}"
+    print(f"{result_key(result):<48} {result['ops']:>8} {result['seconds']:>10.4f} {result['ops_per_sec'] or 0:>12.1f} {peak} {http:>8}")
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> int:
+    """Compare au rapport de référence ; retourne le nombre de régressions"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {result_key(result): result for result in json.load(f)["results"]}
+
+    regressions = 0
+    print(f"\nComparaison avec {baseline_path} (tolérance {tolerance:.0%})")
+    for result in results:
+        base = baseline.get(result_key(result))
+        if not base or not base.get("ops_per_sec") or not result.get("ops_per_sec"):
+            continue
+        ratio = result["ops_per_sec"] / base["ops_per_sec"]
+        flag = "REGRESSION" if ratio < 1 - tolerance else ""
+        regressions += bool(flag)
+        print(f"{result_key(result):<48} {ratio:>7.2f}x {flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne du bot Hoshikuzu")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="tailles des serveurs (membres)")
+    parser.add_argument("--rules", default="10,100,500", help="nombres de règles de statut")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="ne pas mesurer les allocations (plus rapide)")
+    parser.add_argument("--json", help="écrit le rapport JSON dans ce fichier")
+    parser.add_argument("--compare", help="rapport JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="baisse de débit tolérée (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    rule_counts = [int(count) for count in args.rules.split(",") if count]
+
+    print(f"{'scénario':<48} {'ops':>8} {'temps (s)':>10} {'ops/s':>12} {'pic (KiB)':>10} {'http':>8}")
+    results = run_suite(sizes, rule_counts, args.seed, not args.no_memory)
+
+    if args.json:
+        report = {
+            "python": sys.version.split()[0],
+            "discord.py": discord.__version__,
+            "seed": args.seed,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()